@@ -0,0 +1,128 @@
+import numpy as np
+from mpi4py import MPI
+
+from decomposition import Decomposition
+from halo import HaloExchange
+from worker import HALO
+
+# Work of a cell relative to the work of a unit, the array operations of the phases touch the neutral cells too
+CELL_WORK = 0.01
+
+# The grids are only moved if the busiest worker has this much more work than the average one
+IMBALANCE_TOLERANCE = 1.2
+
+
+def board_work(occupied):
+    """Estimate the work of every board cell from the mask of the occupied cells."""
+    return occupied + CELL_WORK
+
+
+def imbalance(decomposition, work):
+    """Ratio of the work of the busiest worker to the average work of the workers."""
+    worker_work = []
+    for worker_index in range(decomposition.worker_count):
+        (row_start, row_end), (col_start, col_end) = decomposition.grid_bounds(
+            decomposition.grid_position(worker_index))
+        worker_work.append(work[row_start:row_end, col_start:col_end].sum())
+
+    return max(worker_work) * len(worker_work) / sum(worker_work)
+
+
+def balanced_bounds(weights, parts, min_length):
+    """Split a weight profile into parts of about equal weight and at least min_length cells, return the bounds."""
+    cumulative = np.concatenate(([0], np.cumsum(weights)))
+    bounds = [0]
+    for part in range(1, parts):
+        target = cumulative[-1] * part / parts
+
+        # the first bound reaching the target, or the one before it if that is closer
+        bound = int(np.searchsorted(cumulative, target))
+        if bound > 0 and target - cumulative[bound - 1] < cumulative[bound] - target:
+            bound -= 1
+
+        # every part keeps enough cells for itself and the parts after it
+        lowest = bounds[-1] + min_length
+        highest = len(weights) - (parts - part) * min_length
+        bounds.append(min(max(bound, lowest), highest))
+
+    bounds.append(len(weights))
+    return bounds
+
+
+def rebalance(decomposition, occupied):
+    """Move the grid bounds so that every worker gets about the same number of occupied cells.
+
+    The rows and the columns are balanced separately on their occupied cell counts, which keeps the grids
+    Cartesian. The current decomposition is kept if it is balanced enough or the new one is not better.
+    """
+    work = board_work(occupied)
+    current_imbalance = imbalance(decomposition, work)
+    if current_imbalance <= IMBALANCE_TOLERANCE:
+        return decomposition
+
+    candidate = Decomposition(decomposition.N,
+                              balanced_bounds(work.sum(axis=1), decomposition.dims[0], HALO),
+                              balanced_bounds(work.sum(axis=0), decomposition.dims[1], HALO))
+    if imbalance(candidate, work) < current_imbalance:
+        return candidate
+
+    return decomposition
+
+
+def overlap(first_bounds, second_bounds):
+    """Get the overlapping board rows and columns of two grids, or None if they do not overlap."""
+    rows = (max(first_bounds[0][0], second_bounds[0][0]), min(first_bounds[0][1], second_bounds[0][1]))
+    cols = (max(first_bounds[1][0], second_bounds[1][0]), min(first_bounds[1][1], second_bounds[1][1]))
+    if rows[0] >= rows[1] or cols[0] >= cols[1]:
+        return None
+
+    return rows, cols
+
+
+def field_cells(worker, board_bounds):
+    """Get the field index slices of the given board rows and columns."""
+    (row_start, row_end), (col_start, col_end) = board_bounds
+    return (slice(row_start - worker.origin[0], row_end - worker.origin[0]),
+            slice(col_start - worker.origin[1], col_end - worker.origin[1]))
+
+
+def migrate(comm, worker, decomposition, tag=8):
+    """Move the units of the worker to the grids of the new decomposition and return the new worker.
+
+    Every worker sends the part of its grid that another worker owns in the new decomposition to that
+    worker, the stats of the units travel with them. The halo of the new worker is refreshed afterwards.
+    """
+    # the new worker runs the same kernels on as many threads
+    new_worker = type(worker)(worker.rank, decomposition, worker.threads)
+    old_decomposition = worker.decomposition
+    old_bounds = old_decomposition.grid_bounds(worker.grid_position)
+    new_bounds = decomposition.grid_bounds(new_worker.grid_position)
+
+    requests = []
+    send_buffers = []
+    receives = []
+    for worker_index in range(decomposition.worker_count):
+        block = overlap(old_bounds, decomposition.grid_bounds(decomposition.grid_position(worker_index)))
+        if block is None:
+            continue
+        cells = field_cells(worker, block)
+        send_buffer = np.stack([array[cells] for array in worker.field_arrays]).astype(np.int32)
+        requests.append(comm.Isend(send_buffer, dest=worker_index + 1, tag=tag))
+        send_buffers.append(send_buffer)
+
+    for worker_index in range(old_decomposition.worker_count):
+        block = overlap(old_decomposition.grid_bounds(old_decomposition.grid_position(worker_index)), new_bounds)
+        if block is None:
+            continue
+        cells = field_cells(new_worker, block)
+        recv_buffer = np.empty((len(new_worker.field_arrays),) + new_worker.faction[cells].shape, dtype=np.int32)
+        requests.append(comm.Irecv(recv_buffer, source=worker_index + 1, tag=tag))
+        receives.append((cells, recv_buffer))
+
+    MPI.Request.Waitall(requests)
+    for cells, recv_buffer in receives:
+        for array, block in zip(new_worker.field_arrays, recv_buffer):
+            array[cells] = block
+
+    HaloExchange(comm, new_worker, new_worker.field_arrays, tag=tag + 1).wait()
+    return new_worker
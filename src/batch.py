@@ -0,0 +1,78 @@
+import os
+
+from mpi4py import MPI
+
+# Rank of the world communicator that hands out the scenarios of a batch
+FARMER = 0
+
+# Tags of the messages between the farmer and the group leaders
+REQUEST_TAG = 20
+TASK_TAG = 21
+
+
+def list_inputs(batch_path):
+    """Get the input files of a batch, the files in a directory or the paths listed in a manifest file.
+
+    The paths in a manifest file are one per line and relative to the directory of the manifest.
+    """
+    if os.path.isdir(batch_path):
+        return sorted(os.path.join(batch_path, name) for name in os.listdir(batch_path)
+                      if os.path.isfile(os.path.join(batch_path, name)))
+
+    with open(batch_path, "r") as file:
+        return [os.path.join(os.path.dirname(batch_path), line.strip()) for line in file if line.strip()]
+
+
+def batch_output_path(output_dir, file_path):
+    """Get the path of the output file of the given input file in the output directory."""
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(file_path))[0] + "_output.txt")
+
+
+def run_batch(comm, batch_path, output_dir, group_size, simulate):
+    """Run every scenario of the batch on a group of ranks, a group gets the next scenario when it is free.
+
+    The farmer rank hands out the scenarios, largest input file first, and the rest of the ranks are split
+    into groups of group_size ranks, at least 2, the last group takes the remaining ranks too. Every group runs
+    simulate(file_path, output_path, comm=group_comm) on its own communicator, where a small board leaves
+    the ranks it cannot give a grid idle.
+    """
+    # every group needs a manager and at least one worker, besides the farmer
+    if group_size < 2 or comm.Get_size() < 3:
+        raise ValueError(f"a batch needs groups of at least 2 ranks and at least 3 ranks in total, "
+                         f"got groups of {group_size} on {comm.Get_size()} ranks")
+
+    rank = comm.Get_rank()
+    group_count = max(1, (comm.Get_size() - 1) // group_size)
+
+    if rank == FARMER:
+        group_comm = comm.Split(MPI.UNDEFINED, key=rank)
+
+        # the largest scenarios are handed out first, so that a long one does not start last
+        tasks = sorted(list_inputs(batch_path), key=os.path.getsize)
+        os.makedirs(output_dir, exist_ok=True)
+
+        # every group leader asks for a scenario when its group is free, no scenario stops the group
+        stopped_groups = 0
+        status = MPI.Status()
+        while stopped_groups < group_count:
+            comm.recv(source=MPI.ANY_SOURCE, tag=REQUEST_TAG, status=status)
+            task = tasks.pop() if tasks else None
+            comm.send(task, dest=status.Get_source(), tag=TASK_TAG)
+            if task is None:
+                stopped_groups += 1
+        return
+
+    group_comm = comm.Split(min((rank - 1) // group_size, group_count - 1), key=rank)
+    while True:
+        task = None
+        if group_comm.Get_rank() == 0:
+            comm.send(None, dest=FARMER, tag=REQUEST_TAG)
+            task = comm.recv(source=FARMER, tag=TASK_TAG)
+
+        task = group_comm.bcast(task, root=0)
+        if task is None:
+            break
+
+        simulate(task, batch_output_path(output_dir, task), comm=group_comm)
+
+    group_comm.Free()
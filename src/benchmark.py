@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import resource
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+from scenario import DISTRIBUTIONS, write_scenario
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_rank(stats_dir, file_path, output_path, trace_path=None):
+    """Run the simulation on this rank, then write its wall time and peak resident memory to the stats directory."""
+    from mpi4py import MPI
+    import main as simulation
+
+    comm = MPI.COMM_WORLD
+    comm.Barrier()
+    start = time.perf_counter()
+    simulation.main(file_path, output_path, trace_path)
+    # the idle ranks wait here too, so every rank measures the time of the whole simulation
+    comm.Barrier()
+    wall_time = time.perf_counter() - start
+
+    with open(os.path.join(stats_dir, f"rank_{comm.Get_rank()}.json"), "w") as file:
+        # ru_maxrss is in kilobytes on Linux
+        json.dump({"wall_time": wall_time, "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}, file)
+
+
+def run_simulation(mpiexec, ranks, file_path, work_dir, output_path=None, trace_path=None):
+    """Run the simulation of the input file on the given number of ranks, return the wall time and peak RSS per rank.
+
+    The output is written to the stats directory of the run unless an output path is given, and the phases
+    are traced to the trace path if one is given.
+    """
+    stats_dir = tempfile.mkdtemp(dir=work_dir)
+    output_path = output_path or os.path.join(stats_dir, "output.txt")
+    trace_args = ["--run-trace", trace_path] if trace_path else []
+    subprocess.run(shlex.split(mpiexec) + ["-n", str(ranks), sys.executable, os.path.abspath(__file__),
+                                           "--run-rank", stats_dir, file_path, output_path] + trace_args,
+                   cwd=SOURCE_DIR, check=True, stdout=subprocess.DEVNULL)
+
+    stats = []
+    for rank in range(ranks):
+        with open(os.path.join(stats_dir, f"rank_{rank}.json")) as file:
+            stats.append(json.load(file))
+    return max(rank_stats["wall_time"] for rank_stats in stats), [rank_stats["peak_rss_kb"] for rank_stats in stats]
+
+
+def benchmark(args, work_dir):
+    """Run the scaling experiments of the arguments, return the result of every run."""
+    base_workers = args.ranks[0] - 1
+    results = []
+    for scaling in args.scaling:
+        for N in args.sizes:
+            base_time = None
+            for ranks in args.ranks:
+                # the manager rank does not simulate, weak scaling keeps the cells and the units per worker fixed
+                workers = ranks - 1
+                scale = (workers / base_workers) ** 0.5 if scaling == "weak" else 1
+                board_size = round(N * scale)
+                units_per_wave = round(args.units * scale ** 2)
+
+                file_path = os.path.join(work_dir, f"{scaling}_{N}_{ranks}.txt")
+                write_scenario(file_path, board_size, args.waves, units_per_wave, args.rounds,
+                               args.distribution, args.seed)
+
+                runs = [run_simulation(args.mpiexec, ranks, file_path, work_dir) for _ in range(args.repeat)]
+                wall_time, peak_rss_kb = min(runs, key=lambda run: run[0])
+                if base_time is None:
+                    base_time = wall_time
+
+                # strong scaling efficiency is the speedup over the worker ratio, weak scaling keeps the time
+                if scaling == "strong":
+                    efficiency = base_time * base_workers / (wall_time * workers)
+                else:
+                    efficiency = base_time / wall_time
+
+                results.append({
+                    "scaling": scaling,
+                    "N": board_size,
+                    "ranks": ranks,
+                    "workers": workers,
+                    "waves": args.waves,
+                    "units_per_wave": units_per_wave,
+                    "rounds_per_wave": args.rounds,
+                    "distribution": args.distribution,
+                    "wall_time": wall_time,
+                    "round_time": wall_time / (args.waves * args.rounds),
+                    "efficiency": efficiency,
+                    "peak_rss_kb": peak_rss_kb,
+                })
+                print(f"{scaling} N={board_size} ranks={ranks} wall={wall_time:.3f}s efficiency={efficiency:.2f}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how the simulation scales with the rank count.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64], help="board sizes, the base sizes of weak scaling")
+    parser.add_argument("--ranks", type=int, nargs="+", default=[2, 3, 5, 9], help="rank counts, the first is the base")
+    parser.add_argument("--scaling", choices=("strong", "weak"), nargs="+", default=["strong", "weak"])
+    parser.add_argument("--waves", type=int, default=4, help="number of waves")
+    parser.add_argument("--units", type=int, default=64, help="units per faction in every wave at the base size")
+    parser.add_argument("--rounds", type=int, default=8, help="rounds per wave")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="runs of every configuration, the fastest one is kept")
+    parser.add_argument("--mpiexec", default="mpiexec", help="the MPI launcher command, -n is appended")
+    parser.add_argument("--output", default="benchmark.json", help="path of the JSON result file")
+    parser.add_argument("--run-rank", nargs=3, metavar=("STATS_DIR", "INPUT", "OUTPUT"), help=argparse.SUPPRESS)
+    parser.add_argument("--run-trace", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_rank:
+        run_rank(*args.run_rank, args.run_trace)
+        return
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = benchmark(args, work_dir)
+
+    with open(args.output, "w") as file:
+        json.dump({"runs": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
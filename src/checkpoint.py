@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from balance import overlap, field_cells
+from decomposition import Decomposition
+
+# Layers of a snapshot file, the faction codes, healths, attack powers and healing rates of the grid
+TILE_LAYERS = 4
+
+
+def step_name(wave, rounds_done):
+    """Name of the checkpoint taken before the given wave, or after the given rounds of it."""
+    return f"wave_{wave:05d}_round_{rounds_done:05d}"
+
+
+def tile_path(directory, name, worker_index):
+    """Path of the snapshot file of the grid of the given worker in the given checkpoint."""
+    return os.path.join(directory, name, f"worker_{worker_index}.bin")
+
+
+class Checkpointer:
+    """Schedule of the checkpoints and the writer of the snapshot files.
+
+    A checkpoint is taken every every_waves waves, before the next wave is received, and every every_rounds
+    rounds counted over all waves. Every worker copies its grid, the faction codes, healths, attack powers
+    and healing rates, into a memory-mapped file and flushes it on a background thread, so the next round
+    only waits for the copy. The manager writes the manifest of the checkpoint, which has the grid bounds.
+    """
+    def __init__(self, directory, every_waves=0, every_rounds=0):
+        self.directory = directory
+        self.every_waves = every_waves
+        self.every_rounds = every_rounds
+        self.pending = None
+
+    def due(self, wave, rounds_done, rounds_per_wave):
+        """Check if a checkpoint is taken before the given wave (no rounds done) or after the given rounds of it."""
+        if self.directory is None:
+            return False
+        if rounds_done == 0:
+            return bool(self.every_waves) and wave > 0 and wave % self.every_waves == 0
+        return bool(self.every_rounds) and (wave * rounds_per_wave + rounds_done) % self.every_rounds == 0
+
+    def write_manifest(self, wave, rounds_done, decomposition, simulation_info):
+        """Write the manifest of the checkpoint with the grid bounds the workers write their grids in."""
+        name = step_name(wave, rounds_done)
+        os.makedirs(os.path.join(self.directory, name), exist_ok=True)
+        N, units_per_wave, rounds_per_wave, wave_count = simulation_info
+        manifest = {
+            "name": name,
+            "wave": wave,
+            "rounds_done": rounds_done,
+            "N": N,
+            "units_per_wave": units_per_wave,
+            "rounds_per_wave": rounds_per_wave,
+            "wave_count": wave_count,
+            "row_bounds": decomposition.row_bounds,
+            "col_bounds": decomposition.col_bounds,
+        }
+        # the manifest appears at once, a reader never sees a partial one
+        manifest_path = os.path.join(self.directory, name, "manifest.json")
+        with open(manifest_path + ".tmp", "w") as file:
+            json.dump(manifest, file)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def write_tile(self, worker, wave, rounds_done):
+        """Copy the grid of the worker into its snapshot file, the file is flushed on a background thread."""
+        self.wait()
+        path = tile_path(self.directory, step_name(wave, rounds_done), worker.rank - 1)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tile = np.memmap(path + ".tmp", dtype=np.int32, mode="w+", shape=(TILE_LAYERS,) + worker.grid_shape)
+        for layer, array in zip(tile, worker.field_arrays):
+            layer[:] = array[worker.grid]
+
+        def flush():
+            tile.flush()
+            # the file only gets its name when it is complete
+            os.replace(path + ".tmp", path)
+
+        self.pending = threading.Thread(target=flush)
+        self.pending.start()
+
+    def wait(self):
+        """Wait for the snapshot file of the last checkpoint to be written."""
+        if self.pending is not None:
+            self.pending.join()
+            self.pending = None
+
+
+def latest_checkpoint(directory):
+    """Get the manifest of the latest checkpoint whose snapshot files are all written, or None."""
+    if directory is None or not os.path.isdir(directory):
+        return None
+
+    for name in sorted(os.listdir(directory), reverse=True):
+        manifest_path = os.path.join(directory, name, "manifest.json")
+        if not os.path.exists(manifest_path):
+            continue
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        decomposition = checkpoint_decomposition(manifest)
+        if all(os.path.exists(tile_path(directory, name, worker_index))
+               for worker_index in range(decomposition.worker_count)):
+            manifest["directory"] = directory
+            return manifest
+
+    return None
+
+
+def checkpoint_decomposition(manifest):
+    """Get the decomposition the grids of the checkpoint were written in."""
+    return Decomposition(manifest["N"], manifest["row_bounds"], manifest["col_bounds"])
+
+
+def read_tiles(manifest):
+    """Yield the board bounds and the memory-mapped snapshot of every grid of the checkpoint."""
+    decomposition = checkpoint_decomposition(manifest)
+    for worker_index in range(decomposition.worker_count):
+        bounds = decomposition.grid_bounds(decomposition.grid_position(worker_index))
+        (row_start, row_end), (col_start, col_end) = bounds
+        tile = np.memmap(tile_path(manifest["directory"], manifest["name"], worker_index), dtype=np.int32,
+                         mode="r", shape=(TILE_LAYERS, row_end - row_start, col_end - col_start))
+        yield bounds, tile
+
+
+def load_board(manifest, faction_board, health_board):
+    """Fill the faction and health boards from the snapshot files of the checkpoint."""
+    for ((row_start, row_end), (col_start, col_end)), tile in read_tiles(manifest):
+        faction_board[row_start:row_end, col_start:col_end] = tile[0]
+        health_board[row_start:row_end, col_start:col_end] = tile[1]
+
+
+def load_field(worker, manifest):
+    """Fill the grid and the halo of the worker from the snapshot files, which can have any grid bounds."""
+    N = worker.N
+    field_bounds = ((max(0, worker.origin[0]), min(N, worker.origin[0] + worker.faction.shape[0])),
+                    (max(0, worker.origin[1]), min(N, worker.origin[1] + worker.faction.shape[1])))
+    for bounds, tile in read_tiles(manifest):
+        block = overlap(bounds, field_bounds)
+        if block is None:
+            continue
+        (row_start, row_end), (col_start, col_end) = block
+        tile_cells = (slice(row_start - bounds[0][0], row_end - bounds[0][0]),
+                      slice(col_start - bounds[1][0], col_end - bounds[1][0]))
+        for array, layer in zip(worker.field_arrays, tile):
+            array[field_cells(worker, block)] = layer[tile_cells]
@@ -0,0 +1,58 @@
+from mpi4py import MPI
+
+from worker import HALO
+
+
+def split_board(length, parts):
+    """Split a board edge into parts that differ by at most 1 cell, return the bounds of the parts."""
+    return [length * part // parts for part in range(parts + 1)]
+
+
+class Decomposition:
+    """Cartesian decomposition of the board into the grids of the workers.
+
+    The board rows are split at row_bounds and the columns at col_bounds, so grids in the same grid row
+    have the same height and grids in the same grid column have the same width. Worker i (rank i+1) owns
+    the grid at position (i // columns, i % columns).
+    """
+    def __init__(self, N, row_bounds, col_bounds):
+        self.N = N
+        self.row_bounds = list(row_bounds)
+        self.col_bounds = list(col_bounds)
+        self.dims = (len(self.row_bounds) - 1, len(self.col_bounds) - 1)
+        self.worker_count = self.dims[0] * self.dims[1]
+
+    def __eq__(self, other):
+        return (isinstance(other, Decomposition) and self.N == other.N and
+                self.row_bounds == other.row_bounds and self.col_bounds == other.col_bounds)
+
+    @classmethod
+    def for_worker_count(cls, N, worker_count):
+        """Decompose the board for as many of the given workers as possible.
+
+        Every grid edge has to be at least as long as the halo, so the halo only spans the neighbours.
+        """
+        for count in range(worker_count, 1, -1):
+            dims = MPI.Compute_dims(count, 2)
+            if N // max(dims) >= HALO:
+                return cls(N, split_board(N, dims[0]), split_board(N, dims[1]))
+
+        return cls(N, [0, N], [0, N])
+
+    def grid_position(self, worker_index):
+        """Get the (row, column) position of the grid of the given worker index."""
+        return divmod(worker_index, self.dims[1])
+
+    def worker_index(self, grid_position):
+        """Get the worker index of the grid at the given position."""
+        return grid_position[0] * self.dims[1] + grid_position[1]
+
+    def grid_bounds(self, grid_position):
+        """Get the board row and column bounds of the grid at the given position."""
+        row, col = grid_position
+        return (self.row_bounds[row], self.row_bounds[row + 1]), (self.col_bounds[col], self.col_bounds[col + 1])
+
+    def field_shape(self, grid_position):
+        """Get the shape of the field of the grid at the given position, the grid and its halo."""
+        (row_start, row_end), (col_start, col_end) = self.grid_bounds(grid_position)
+        return row_end - row_start + 2*HALO, col_end - col_start + 2*HALO
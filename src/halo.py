@@ -0,0 +1,100 @@
+from contextlib import nullcontext
+
+import numpy as np
+from mpi4py import MPI
+
+from worker import HALO
+
+# Directions of the neighbouring workers, side neighbours first then the diagonal ones
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+
+
+def grid_strip(length, step):
+    """Slice of the grid cells along one axis that the neighbour in the given step keeps in its halo."""
+    if step < 0:
+        return slice(HALO, 2*HALO)
+    if step > 0:
+        return slice(length, length + HALO)
+    return slice(HALO, HALO + length)
+
+
+def halo_strip(length, step):
+    """Slice of the halo cells along one axis that lie in the grid of the neighbour in the given step."""
+    if step < 0:
+        return slice(0, HALO)
+    if step > 0:
+        return slice(HALO + length, length + 2*HALO)
+    return slice(HALO, HALO + length)
+
+
+class HaloExchange:
+    """Non-blocking exchange of the grid edges of the given field arrays with the neighbours.
+
+    Side neighbours exchange edge strips and diagonal neighbours exchange corner blocks. Every strip
+    of every array is packed into one contiguous typed buffer, so the message size only depends on the
+    halo size. The messages are posted on creation and the halo is only written by wait, so the cells
+    that do not read the halo can be computed while the messages are in flight. The message sizes and
+    the wait are recorded on the timeline if one is given.
+
+    With a cache of the last strips sent to and received from every neighbour, a strip that did not
+    change since it was last sent goes as an empty message and the neighbour fills its halo from its cache.
+    """
+    def __init__(self, comm, worker, arrays, tag, timeline=None, cache=None):
+        self.arrays = arrays
+        self.tag = tag
+        self.timeline = timeline
+        self.cache = cache
+        self.recv_requests = []
+        self.send_requests = []
+        self.receives = []
+        self.send_buffers = []
+        buffer_type = np.result_type(*arrays)
+
+        sent_bytes = {}
+        for direction, neighbour_rank in worker.get_neighbour_worker_ranks().items():
+            recv_cells = (halo_strip(worker.grid_shape[0], direction[0]),
+                          halo_strip(worker.grid_shape[1], direction[1]))
+            recv_buffer = np.empty((len(arrays),) + arrays[0][recv_cells].shape, dtype=buffer_type)
+            self.recv_requests.append(comm.Irecv(recv_buffer, source=neighbour_rank, tag=tag))
+            self.receives.append((direction, neighbour_rank, recv_cells, recv_buffer))
+
+            send_cells = (grid_strip(worker.grid_shape[0], direction[0]),
+                          grid_strip(worker.grid_shape[1], direction[1]))
+            send_buffer = np.stack([array[send_cells] for array in arrays]).astype(buffer_type, copy=False)
+            if cache is not None:
+                if np.array_equal(cache["sent"].get(direction), send_buffer):
+                    send_buffer = send_buffer[:0]
+                else:
+                    cache["sent"][direction] = send_buffer
+            self.send_requests.append(comm.Isend(send_buffer, dest=neighbour_rank, tag=tag))
+            self.send_buffers.append(send_buffer)
+            sent_bytes[neighbour_rank] = send_buffer.nbytes
+
+        if timeline is not None:
+            timeline.messages(sent=sent_bytes, received={})
+
+    def wait(self):
+        """Wait for the messages and fill the halo, the halo on a side without a neighbour stays neutral."""
+        statuses = [MPI.Status() for _ in self.recv_requests]
+        with self.timeline.phase("halo wait", tag=self.tag) if self.timeline else nullcontext():
+            MPI.Request.Waitall(self.recv_requests, statuses)
+            MPI.Request.Waitall(self.send_requests)
+
+        received_bytes = {}
+        for (direction, neighbour_rank, recv_cells, recv_buffer), status in zip(self.receives, statuses):
+            received_bytes[neighbour_rank] = status.Get_count(MPI.BYTE)
+            # an empty message is the strip the neighbour sent last
+            if self.cache is not None:
+                if received_bytes[neighbour_rank] == 0:
+                    recv_buffer = self.cache["received"][direction]
+                else:
+                    self.cache["received"][direction] = recv_buffer
+
+            for array, strip in zip(self.arrays, recv_buffer):
+                array[recv_cells] = strip
+
+        if self.timeline is not None and self.receives:
+            self.timeline.messages(sent={}, received=received_bytes)
+
+        # waiting again is a no-op
+        self.recv_requests, self.send_requests, self.receives, self.send_buffers = [], [], [], []
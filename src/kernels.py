@@ -0,0 +1,196 @@
+import warnings
+
+import numpy as np
+
+from unit import NEUTRAL, AIR, MAX_HEALTH, ATTACK_DIRECTIONS, AirUnit
+from worker import Worker, ACTION_PACK, FLOOD_PACK, ATTACK, STAY
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Kernels of the phases, the NumPy array operations of the worker or the compiled per-cell loops
+KERNELS = ("numpy", "jit")
+
+# Row and column offsets of the attack directions, in the order of the columns of ATTACK_DIRECTIONS
+DIRECTION_OFFSETS = np.array(AirUnit.attack_directions, dtype=np.int64)
+
+
+def jit(kernel):
+    """Compile the kernel in nopython mode if Numba is installed, otherwise keep the Python function."""
+    if njit is None:
+        return kernel
+    return njit(cache=True, nogil=True)(kernel)
+
+
+@jit
+def attackable_enemies(faction, row, col, vacated_row, vacated_col, offsets):
+    """Count the enemies an air unit in the given cell would attack, the vacated cell counts as neutral."""
+    count = 0
+    for k in range(offsets.shape[0]):
+        i, j = offsets[k, 0], offsets[k, 1]
+        for distance in range(1, 3):
+            target_row, target_col = row + distance*i, col + distance*j
+            vacated = target_row == vacated_row and target_col == vacated_col
+            code = NEUTRAL if vacated else faction[target_row, target_col]
+            # an air unit attacks the first unit, or the second cell over a neutral one
+            if code != NEUTRAL:
+                if code != AIR:
+                    count += 1
+                break
+    return count
+
+
+@jit
+def move_kernel(faction, on_board, rows, cols, offsets, move_direction):
+    """Decide the move directions of the air units in the given field indices into the move direction array.
+
+    Every unit checks the neutral neighbours in row order and only takes one that beats the unit cell and
+    every neighbour before it, so ties keep the lexicographically smaller earlier position.
+    """
+    for k in range(rows.shape[0]):
+        row, col = rows[k], cols[k]
+        best_attackable = attackable_enemies(faction, row, col, -1, -1, offsets)
+        best_direction = STAY
+        for direction in range(9):
+            to_row, to_col = row + direction // 3 - 1, col + direction % 3 - 1
+            if direction == STAY or not on_board[to_row, to_col] or faction[to_row, to_col] != NEUTRAL:
+                continue
+            attackable = attackable_enemies(faction, to_row, to_col, row, col, offsets)
+            if attackable > best_attackable:
+                best_attackable = attackable
+                best_direction = direction
+        move_direction[row, col] = best_direction
+
+
+@jit
+def attack_kernel(faction, health, attack_power, rows, cols, offsets, attack_directions, max_health, attacks):
+    """Write the (attacker row, attacker column, row, column, attack power) rows of the attacks on the units in
+    the given field indices to the attacks array, return their number."""
+    count = 0
+    for k in range(rows.shape[0]):
+        row, col = rows[k], cols[k]
+        code = faction[row, col]
+        for direction in range(offsets.shape[0]):
+            i, j = offsets[direction, 0], offsets[direction, 1]
+            attacker_row, attacker_col = row - i, col - j
+            attacker_code = faction[attacker_row, attacker_col]
+
+            # an air unit attacks 2 cells away over a neutral cell
+            if attacker_code == NEUTRAL:
+                attacker_row, attacker_col = row - 2*i, col - 2*j
+                attacker_code = faction[attacker_row, attacker_col]
+                if attacker_code != AIR:
+                    continue
+            elif not attack_directions[attacker_code, direction]:
+                continue
+
+            # units below 50 percent health heal instead of attacking
+            if attacker_code == code or 2 * health[attacker_row, attacker_col] < max_health[attacker_code]:
+                continue
+
+            attacks[count, 0], attacks[count, 1] = attacker_row, attacker_col
+            attacks[count, 2], attacks[count, 3] = row, col
+            attacks[count, 4] = attack_power[attacker_row, attacker_col]
+            count += 1
+    return count
+
+
+@jit
+def attacking_kernel(faction, health, on_board, rows, cols, offsets, attack_directions, max_health, attacking):
+    """Mark the units in the given field indices that attack this round instead of healing."""
+    for k in range(rows.shape[0]):
+        row, col = rows[k], cols[k]
+        code = faction[row, col]
+        attacking[k] = False
+        if 2 * health[row, col] < max_health[code]:
+            continue
+
+        for direction in range(offsets.shape[0]):
+            if not attack_directions[code, direction]:
+                continue
+            target_row, target_col = row + offsets[direction, 0], col + offsets[direction, 1]
+
+            # if the unit is an air unit, check enlarged attack positions
+            if code == AIR and faction[target_row, target_col] == NEUTRAL:
+                target_row, target_col = row + 2 * offsets[direction, 0], col + 2 * offsets[direction, 1]
+
+            target = faction[target_row, target_col]
+            if on_board[target_row, target_col] and target != NEUTRAL and target != code:
+                attacking[k] = True
+                break
+
+
+@jit
+def flood_kernel(faction, on_board, region, rows, cols, floods):
+    """Write the (row, column, flooded row, flooded column) rows of the floods of the water units in the given
+    field indices to the floods array, return their number. The floods of the halo are left to the neighbour."""
+    count = 0
+    for k in range(rows.shape[0]):
+        row, col = rows[k], cols[k]
+        # the lexicographically smallest neutral neighbour is the first one in row order
+        for direction in range(9):
+            to_row, to_col = row + direction // 3 - 1, col + direction % 3 - 1
+            if on_board[to_row, to_col] and faction[to_row, to_col] == NEUTRAL:
+                if region[to_row, to_col] != 1:
+                    floods[count, 0], floods[count, 1], floods[count, 2], floods[count, 3] = row, col, to_row, to_col
+                    count += 1
+                break
+    return count
+
+
+class JitWorker(Worker):
+    """Worker that runs the move, action and flood phases with compiled per-cell kernels over its field arrays.
+
+    The resolution of the packs and the halo are the same as in the NumPy worker.
+    """
+    def move_phase(self, interior):
+        """Decide the move directions of the air units in region 3, or in region 2."""
+        rows, cols = self._deciding_air_units(interior)
+        self._map_bands(self.decide_moves, rows, cols)
+        return self.move_direction
+
+    def decide_moves(self, rows, cols):
+        """Decide the move directions of the air units in the given field indices."""
+        move_kernel(self.faction, self.on_board, rows, cols, DIRECTION_OFFSETS, self.move_direction)
+
+    def is_attacking(self, rows, cols):
+        """Check which units in the given field indices attack this round instead of healing."""
+        attacking = np.zeros(len(rows), dtype=bool)
+        attacking_kernel(self.faction, self.health, self.on_board, rows, cols, DIRECTION_OFFSETS, ATTACK_DIRECTIONS,
+                         MAX_HEALTH, attacking)
+        return attacking
+
+    def attacks_on(self, rows, cols):
+        """Create the attack packs of the units attacking the units in the given field indices."""
+        attacks = np.empty((len(rows) * len(DIRECTION_OFFSETS), 5), dtype=np.int32)
+        count = attack_kernel(self.faction, self.health, self.attack_power, rows, cols, DIRECTION_OFFSETS,
+                              ATTACK_DIRECTIONS, MAX_HEALTH, attacks)
+
+        attack_packs = np.empty(count, dtype=ACTION_PACK)
+        attack_packs["type"] = ATTACK
+        attack_packs["from"] = attacks[:count, 0:2]
+        attack_packs["to"] = attacks[:count, 2:4]
+        attack_packs["attack_power"] = attacks[:count, 4]
+        return attack_packs
+
+    def floods_of(self, rows, cols):
+        """Create the flood packs of the water units in the given field indices."""
+        floods = np.empty((len(rows), 4), dtype=np.int32)
+        count = flood_kernel(self.faction, self.on_board, self.region, rows, cols, floods)
+
+        flood_packs = np.empty(count, dtype=FLOOD_PACK)
+        flood_packs["from"] = floods[:count, 0:2]
+        flood_packs["to"] = floods[:count, 2:4]
+        flood_packs["attack_power"] = self.attack_power[floods[:count, 0], floods[:count, 1]]
+        return flood_packs
+
+
+def select_worker_type(kernels="numpy"):
+    """Get the worker class of the given kernels, the NumPy worker if the JIT kernels need Numba and it is missing."""
+    if kernels == "jit" and njit is None:
+        warnings.warn("Numba is not installed, the NumPy kernels are used")
+        return Worker
+
+    return JitWorker if kernels == "jit" else Worker
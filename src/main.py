@@ -1,186 +1,311 @@
 #!/usr/bin/env python
-import math
+import argparse
+import os
+from functools import partial
+from itertools import islice
 
+import numpy as np
 from mpi4py import MPI
-from worker import Worker
-
-# MPI setup
-comm = MPI.COMM_WORLD
-world_size = comm.Get_size()
-rank = comm.Get_rank()
+from unit import NEUTRAL, FACTION_SYMBOLS
+from worker import Worker, HALO
+from halo import HaloExchange
+from decomposition import Decomposition
+from balance import rebalance, migrate
+from timeline import Timeline
+from checkpoint import Checkpointer, latest_checkpoint, load_board, load_field
+from batch import run_batch
+from output import OUTPUT_FORMATS, OutputWriter
+from scenario import parse_input_header, read_waves
+from shared import run_shared
+from kernels import KERNELS, select_worker_type
 
 # Constant for manager rank
 MANAGER = 0
 
-# get the max perfect square number that is less than or equal to the world size
-worker_count = int(math.sqrt(world_size - 1)) ** 2
+def main(file_path="./io/input1.txt", output_path="./io/output1.txt", trace_path=None, checkpointer=None,
+         resume=False, comm=MPI.COMM_WORLD, output_writer=None, worker_type=Worker):
+    # MPI setup, the simulation runs on the ranks of the given communicator
+    world_size = comm.Get_size()
+    rank = comm.Get_rank()
+
+    # the checkpoints are only taken if the checkpointer has a directory
+    checkpointer = checkpointer or Checkpointer(None)
+    output_writer = output_writer or OutputWriter()
 
-def main():
     if rank == MANAGER: # Manager
 
-        file_path = "./io/input1.txt"
+        N, wave_count, units_per_wave, rounds_per_wave = parse_input_header(file_path)
 
-        board_for_waves, N, wave_count, units_per_wave, rounds_per_wave = parse_input(file_path)
+        # every rank except the manager gets a grid, unless the board is too small for all of them
+        decomposition = Decomposition.for_worker_count(N, world_size - 1)
 
-        grid_size = int(N / math.sqrt(worker_count))
+        # continue after the latest checkpoint if there is one, its grid bounds do not have to match
+        manifest = latest_checkpoint(checkpointer.directory) if resume else None
 
         # Send the simulation info to the workers
-        for worker_index in range(1, worker_count+1):
-            comm.send((N, units_per_wave, rounds_per_wave, wave_count, grid_size), dest=worker_index, tag=1)
-
-        # Send the board to the workers
-        for wave_index in range(wave_count):
-            # partition the board to fields and send them to the workers
-            worker_fields = partition_board_to_fields(board_for_waves[wave_index], N, worker_count, grid_size)
-
-            # Send the fields to the workers
-            for worker_index in range(1, worker_count+1):
-                comm.send(worker_fields[worker_index - 1], dest=worker_index, tag=0)
-
-            # # The debug print to get the board after each round in a wave
-            # for round_number in range(rounds_per_wave):
-            #     worker_regions_combined = {}
-            #     for worker_index in range(1, worker_count+1):
-            #         worker_regions = comm.recv(source=worker_index, tag=0)
-            #         worker_regions_combined.update(worker_regions)
-            #
-            #     print("Round", round_number+1)
-            #     print_dict_board(worker_regions_combined, N)
-
-            # ------- BEFORE ENDING THE WAVE -------
-
-            # Receive the fields from the workers
-            worker_regions_combined = {}
-            for worker_index in range(1, worker_count+1):
-                worker_regions = comm.recv(source=worker_index, tag=0)
-                worker_regions_combined.update(worker_regions)
-
-            # Print the board after the wave ends
-            # print("Wave", wave_index+1)
-
-            # Print the last state of the board after the waves end
-            if wave_index == wave_count - 1:
-                with open("./io/output1.txt", "w") as file:
-                    for i in range(N):
-                        for j in range(N):
-                            if worker_regions_combined[(i, j)] == "." or worker_regions_combined[(i, j)] is None:
-                                file.write(".")
-                            else:
-                                file.write(worker_regions_combined[(i, j)].faction[0])
-                            if j != N - 1:
-                                file.write(" ")
-                        file.write("\n")
+        comm.bcast((N, units_per_wave, rounds_per_wave, wave_count, decomposition, manifest), root=MANAGER)
+        simulation_comm = split_simulation_comm(comm, decomposition)
+        try:
+            timeline = Timeline(simulation_comm, enabled=trace_path is not None)
+
+            # the workers gather their regions 2 and 3 into this buffer, which is placed on the boards
+            gathered = np.empty(2 * N * N, dtype=np.int32)
+            faction_board, health_board = np.zeros((2, N, N), dtype=np.int32)
+
+            start_wave, start_rounds = 0, 0
+            if manifest is not None:
+                start_wave, start_rounds = manifest["wave"], manifest["rounds_done"]
+                load_board(manifest, faction_board, health_board)
+
+            # Send the board to the workers, every wave is read while the workers run the rounds of the one before
+            waves = islice(read_waves(file_path), start_wave, None)
+            # the waves missing from the input file are run without new units
+            no_units = np.empty((0, 3), dtype=np.int32)
+            with timeline.phase("read wave", wave=start_wave):
+                wave_units = next(waves, no_units)
+            for wave_index in range(start_wave, wave_count):
+                # a wave resumed after some of its rounds is already on the board
+                first_round = start_rounds if wave_index == start_wave else 0
+                scatter_request = None
+                if first_round == 0:
+                    # move the grid bounds so the workers share the units left on the board and the new ones evenly
+                    with timeline.phase("rebalance", wave=wave_index):
+                        occupied = faction_board != NEUTRAL
+                        occupied[wave_units[:, 0], wave_units[:, 1]] = True
+                        decomposition = rebalance(decomposition, occupied)
+
+                    # Send the grid bounds and post the units of their fields to the workers
+                    with timeline.phase("scatter wave", wave=wave_index):
+                        scatter_request = scatter_wave(simulation_comm, wave_units, decomposition)
+
+                # parse the next wave while the units are on their way and the workers run the rounds
+                if wave_index + 1 < wave_count:
+                    with timeline.phase("read wave", wave=wave_index + 1):
+                        wave_units = next(waves, no_units)
+
+                # write the manifests of the checkpoints in the wave, the workers write their grids on their own
+                for rounds_done in range(first_round + 1, rounds_per_wave + 1):
+                    if checkpointer.due(wave_index, rounds_done, rounds_per_wave):
+                        checkpointer.write_manifest(wave_index, rounds_done, decomposition,
+                                                    (N, units_per_wave, rounds_per_wave, wave_count))
+                if checkpointer.due(wave_index + 1, 0, rounds_per_wave):
+                    checkpointer.write_manifest(wave_index + 1, 0, decomposition,
+                                                (N, units_per_wave, rounds_per_wave, wave_count))
+
+                # # The debug print to get the board after each round in a wave
+                # for round_number in range(rounds_per_wave):
+                #     combine_worker_regions(simulation_comm, decomposition, gathered, faction_board, health_board)
+                #
+                #     print("Round", round_number+1)
+                #     print_board_debug(faction_board, health_board)
+
+                # ------- BEFORE ENDING THE WAVE -------
+
+                # Receive the fields from the workers
+                with timeline.phase("gather regions", wave=wave_index):
+                    if scatter_request is not None:
+                        scatter_request.Wait()
+                    combine_worker_regions(simulation_comm, decomposition, gathered, faction_board, health_board)
+
+                # the workers write the snapshot of the wave end
+                with timeline.phase("write snapshot", wave=wave_index):
+                    output_writer.write_snapshot(simulation_comm, N, wave_index)
+
+                # Print the board after the wave ends
+                # print("Wave", wave_index+1)
+
+            # Print the last state of the board after the waves end, or let the workers write their grids
+            with timeline.phase("write output"):
+                if output_writer.parallel:
+                    output_writer.write_output(simulation_comm, N, output_path)
+                else:
+                    output_writer.write_board(output_path, faction_board)
+
+            timeline.write(trace_path, root=MANAGER)
+        finally:
+            simulation_comm.Free()
 
     else: # Worker
-        if rank > worker_count:
-            return
         # Receive the simulation info from the manager
-        N, units_per_wave, rounds_per_wave, wave_count, grid_size = comm.recv(source=MANAGER, tag=1)
-        grid_edge_length = int(math.sqrt(world_size - 1))
-
-        # Create the worker instance
-        worker = Worker(rank, grid_size, grid_edge_length, N)
-
-        # Start the simulation, iterate over the waves
-        for i in range(wave_count):
-            # Receive the field from the manager
-            worker_field = comm.recv(source=MANAGER, tag=0)
-
-            # Set and update the field from the info received
-            worker.receive_wave_info(worker_field)
-
-            # Iterate over the rounds in the wave
-            for round_number in range(rounds_per_wave):
-                ############# ROUND STARTED #############
-
-                # ------- MOVE PHASE START -------
-                # get the move packs from the worker
-                move_packs = worker.move_phase()
-
-                # get the neighbour ranks of the worker
-                neighbour_ranks = worker.get_neighbour_worker_ranks()
-
-                # send the move packs to the neighbours
-                for neighbour_rank in neighbour_ranks:
-                    move_packs_filtered = worker.filter_moves(move_packs)
-                    comm.send(move_packs_filtered, dest=neighbour_rank, tag=2)
-
-                # receive the move packs from the neighbours
-                every_neighbour_move = {}
-                for neighbour_rank in neighbour_ranks:
-                    neighbour_moves = comm.recv(source=neighbour_rank, tag=2)
-                    every_neighbour_move[neighbour_rank] = neighbour_moves
-
-                # resolve the moves
-                worker.resolve_moves(every_neighbour_move, move_packs)
-                # ------- MOVE PHASE END -------
-
-
-                # ------- ACTION PHASE START -------
-                # get the action packs from the worker
-                action_packs = worker.action_phase()
-
-                # get the neighbour ranks of the worker
-                for neighbour_rank in neighbour_ranks:
-                    action_packs_filtered = worker.filter_actions(action_packs)
-                    comm.send(action_packs_filtered, dest=neighbour_rank, tag=4)
-
-                # receive the action packs from the neighbours
-                every_neighbour_action = {}
-                for neighbour_rank in neighbour_ranks:
-                    neighbour_actions = comm.recv(source=neighbour_rank, tag=4)
-                    every_neighbour_action[neighbour_rank] = neighbour_actions
-
-                # resolve the actions
-                worker.resolve_actions(every_neighbour_action, action_packs)
-                # ------- ACTION PHASE END -------
-
-                # # The debug send to get the board after each round in a wave
-                # comm.send(worker.get_r2_r3(), dest=MANAGER, tag=0)
-                ############# ROUND ENDED #############
-
-            # ------- BEFORE ENDING THE WAVE -------
-
-            # flood ability of the water units
-            flood_packs = worker.flood_phase()
-            neighbour_ranks = worker.get_neighbour_worker_ranks()
-
-            # send the flood packs to the neighbours
-            for neighbour_rank in neighbour_ranks:
-                flood_packs_filtered = worker.filter_floods(flood_packs)
-                comm.send(flood_packs_filtered, dest=neighbour_rank, tag=6)
-
-            # receive the flood packs from the neighbours
-            every_neighbour_flood = {}
-            for neighbour_rank in neighbour_ranks:
-                neighbour_floods = comm.recv(source=neighbour_rank, tag=6)
-                every_neighbour_flood[neighbour_rank] = neighbour_floods
-
-            # resolve the floods
-            worker.resolve_floods(every_neighbour_flood, flood_packs)
-
-            ############# WAVE ENDED #############
-            # Reset the attack powers of the units
-            worker.reset_attack_powers()
-
-            # Send the wave-end r2_r3 values to the manager
-            comm.send(worker.get_r2_r3(), dest=MANAGER, tag=0)
-
-
-def partition_board_to_fields(board, N, worker_count, grid_size):
-    """Partition the board to fields for each worker"""
-    worker_fields = []
-    for i in range(int(math.sqrt(worker_count))):
-        for j in range(int(math.sqrt(worker_count))):
-            worker_field = {}
-            for x in range(i*grid_size - 3, (i+1)*grid_size + 3):
-                for y in range(j*grid_size - 3, (j+1)*grid_size + 3):
-                    if (0 <= x < N) and (0 <= y < N):
-                        worker_field[(x, y)] = board[x][y]
-                    else:
-                        worker_field[(x, y)] = None
-            worker_fields.append(worker_field)
-    return worker_fields
+        N, units_per_wave, rounds_per_wave, wave_count, decomposition, manifest = comm.bcast(None, root=MANAGER)
+        simulation_comm = split_simulation_comm(comm, decomposition)
+        if simulation_comm == MPI.COMM_NULL:
+            return
+        try:
+            timeline = Timeline(simulation_comm, enabled=trace_path is not None)
+
+            # Create the worker instance
+            worker = timeline.instrument(worker_type(rank, decomposition))
+
+            # a resumed worker reads its grid and halo from the snapshot files of the checkpoint
+            start_wave, start_rounds = 0, 0
+            if manifest is not None:
+                start_wave, start_rounds = manifest["wave"], manifest["rounds_done"]
+                load_field(worker, manifest)
+
+            # every phase waits on the last halo exchange, the first one carries the empty field
+            halo_exchange = HaloExchange(simulation_comm, worker, worker.field_arrays, tag=6,
+                                         timeline=timeline, cache=worker.halo_cache)
+
+            # Start the simulation, iterate over the waves
+            for i in range(start_wave, wave_count):
+                # a wave resumed after some of its rounds is already on the field
+                first_round = start_rounds if i == start_wave else 0
+                if first_round == 0:
+                    # Receive the grid bounds and the new units of the field from the manager
+                    with timeline.phase("receive wave", wave=i):
+                        wave_decomposition, wave_units, wave_request = receive_wave(simulation_comm)
+
+                    # after the halo of the last wave and the units arrive, move the units to their new grids if the
+                    # bounds moved
+                    halo_exchange.wait()
+                    with timeline.phase("wave units wait", wave=i):
+                        wave_request.Wait()
+                    if wave_decomposition != worker.decomposition:
+                        with timeline.phase("migrate", wave=i):
+                            worker = timeline.instrument(migrate(simulation_comm, worker, wave_decomposition))
+
+                    # Set and update the field from the info received
+                    worker.receive_wave_info(wave_units)
+
+                # Iterate over the rounds in the wave
+                for round_number in range(first_round, rounds_per_wave):
+                    ############# ROUND STARTED #############
+
+                    # ------- MOVE PHASE START -------
+                    with timeline.phase("move phase", wave=i, round=round_number):
+                        # decide the moves in region 3 while the halo arrives, then the moves in region 2
+                        worker.move_phase(interior=True)
+                        halo_exchange.wait()
+                        worker.move_phase(interior=False)
+
+                        # share the move directions, collect the moves to region 3 while the neighbour directions arrive
+                        direction_exchange = HaloExchange(simulation_comm, worker, [worker.move_direction], tag=2,
+                                                          timeline=timeline)
+                        move_packs = worker.collect_moves(interior=True)
+                        direction_exchange.wait()
+                        move_packs = np.concatenate((move_packs, worker.collect_moves(interior=False)))
+
+                        # resolve the moves and start refreshing the halo
+                        worker.resolve_moves(move_packs)
+                        halo_exchange = HaloExchange(simulation_comm, worker, worker.field_arrays, tag=3,
+                                                     timeline=timeline, cache=worker.halo_cache)
+                    # ------- MOVE PHASE END -------
+
+
+                    # ------- ACTION PHASE START -------
+                    with timeline.phase("action phase", wave=i, round=round_number):
+                        # get the action packs of region 3 while the halo arrives, then the ones of the rest
+                        action_packs = worker.action_phase(interior=True)
+                        halo_exchange.wait()
+                        action_packs = np.concatenate((action_packs, worker.action_phase(interior=False)))
+
+                        # resolve the actions and start refreshing the halo
+                        worker.resolve_actions(action_packs)
+                        halo_exchange = HaloExchange(simulation_comm, worker, worker.field_arrays, tag=4,
+                                                     timeline=timeline, cache=worker.halo_cache)
+                    # ------- ACTION PHASE END -------
+
+                    # the snapshot is written while the halo is in flight
+                    if checkpointer.due(i, round_number + 1, rounds_per_wave):
+                        with timeline.phase("checkpoint", wave=i, round=round_number):
+                            checkpointer.write_tile(worker, i, round_number + 1)
+
+                    # # The debug send to get the board after each round in a wave
+                    # simulation_comm.Gatherv(worker.get_r2_r3(), None, root=MANAGER)
+                    ############# ROUND ENDED #############
+
+                # ------- BEFORE ENDING THE WAVE -------
+
+                with timeline.phase("flood phase", wave=i):
+                    # flood ability of the water units, the halo water units flooding the grid are included
+                    flood_packs = worker.flood_phase(interior=True)
+                    halo_exchange.wait()
+                    flood_packs = np.concatenate((flood_packs, worker.flood_phase(interior=False)))
+
+                    # resolve the floods
+                    worker.resolve_floods(flood_packs)
+
+                    # Reset the attack powers of the units and start refreshing the halo
+                    worker.reset_attack_powers()
+                    halo_exchange = HaloExchange(simulation_comm, worker, worker.field_arrays, tag=6,
+                                                 timeline=timeline, cache=worker.halo_cache)
+
+                if checkpointer.due(i + 1, 0, rounds_per_wave):
+                    with timeline.phase("checkpoint", wave=i):
+                        checkpointer.write_tile(worker, i + 1, 0)
+
+                ############# WAVE ENDED #############
+                # Send the wave-end r2_r3 values to the manager
+                with timeline.phase("gather regions", wave=i):
+                    simulation_comm.Gatherv(worker.get_r2_r3(), None, root=MANAGER)
+
+                with timeline.phase("write snapshot", wave=i):
+                    output_writer.write_snapshot(simulation_comm, N, i, worker)
+
+            halo_exchange.wait()
+            checkpointer.wait()
+
+            if output_writer.parallel:
+                with timeline.phase("write output"):
+                    output_writer.write_output(simulation_comm, N, output_path, worker)
+            timeline.write(trace_path, root=MANAGER)
+        finally:
+            simulation_comm.Free()
+
+
+def split_simulation_comm(comm, decomposition):
+    """Split the communicator of the manager and the ranks with a grid, the rest get MPI.COMM_NULL"""
+    rank = comm.Get_rank()
+    color = 0 if rank <= decomposition.worker_count else MPI.UNDEFINED
+    return comm.Split(color, key=rank)
+
+def partition_units_to_fields(units, decomposition):
+    """Partition the units of a wave to the fields of the workers, a unit in the halo of a worker goes to it too.
+
+    The units of the fields are laid out one after the other in a single buffer, return it with their sizes.
+    """
+    worker_units = []
+    for worker_index in range(decomposition.worker_count):
+        (row_start, row_end), (col_start, col_end) = decomposition.grid_bounds(
+            decomposition.grid_position(worker_index))
+        in_field = ((row_start - HALO <= units[:, 0]) & (units[:, 0] < row_end + HALO) &
+                    (col_start - HALO <= units[:, 1]) & (units[:, 1] < col_end + HALO))
+        worker_units.append(units[in_field])
+    return np.concatenate(worker_units).ravel(), [field_units.size for field_units in worker_units]
+
+def scatter_wave(comm, units, decomposition):
+    """Send the decomposition to the workers and post the scatter of the units of the wave to the fields they lie in
+
+    Return the request of the scatter, the units buffer is kept until it is waited on.
+    """
+    comm.bcast(decomposition, root=MANAGER)
+    buffer, field_sizes = partition_units_to_fields(units, decomposition)
+    comm.scatter([0] + field_sizes, root=MANAGER)
+    return comm.Iscatterv([buffer, [0] + field_sizes], np.empty(0, dtype=np.int32), root=MANAGER)
+
+def receive_wave(comm):
+    """Receive the decomposition and post the receive of the (row, column, faction code) rows of the new units in
+    the worker field, the units are there when the returned request is waited on"""
+    decomposition = comm.bcast(None, root=MANAGER)
+    units = np.empty(comm.scatter(None, root=MANAGER), dtype=np.int32)
+    request = comm.Iscatterv(None, units, root=MANAGER)
+    return decomposition, units.reshape(-1, 3), request
+
+def combine_worker_regions(comm, decomposition, gathered, faction_board, health_board):
+    """Gather the regions 2 and 3 of the workers and combine them into the faction and health boards"""
+    grid_bounds = [decomposition.grid_bounds(decomposition.grid_position(worker_index))
+                   for worker_index in range(decomposition.worker_count)]
+    region_sizes = [2 * (row_end - row_start) * (col_end - col_start)
+                    for (row_start, row_end), (col_start, col_end) in grid_bounds]
+    comm.Gatherv(np.empty(0, dtype=np.int32), [gathered, [0] + region_sizes], root=MANAGER)
+
+    offset = 0
+    for ((row_start, row_end), (col_start, col_end)), region_size in zip(grid_bounds, region_sizes):
+        faction, health = gathered[offset:offset + region_size].reshape(2, row_end - row_start, col_end - col_start)
+        faction_board[row_start:row_end, col_start:col_end] = faction
+        health_board[row_start:row_end, col_start:col_end] = health
+        offset += region_size
 
 def print_2d_grid(grid):
     """Debug print for 2D grids"""
@@ -188,86 +313,80 @@ def print_2d_grid(grid):
         print(" ".join(row))
     print()
 
-def dict_to_board(board_dict, N):
-    """Convert the board dictionary to a 2D list"""
-    board = [["." for _ in range(N)] for _ in range(N)]
-    for coord, unit in board_dict.items():
-        board[coord[0]][coord[1]] = unit
-    return board
-
-def print_dict_board(board_dict, N):
-    """Print the board dictionary"""
-    for i in range(0, N):
-        for j in range(0, N):
-            print(board_dict[(i, j)], end=" ")
-        print()
+def print_board(faction_board):
+    """Print the faction board"""
+    for row in faction_board:
+        print(" ".join(FACTION_SYMBOLS[code] for code in row))
     print()
 
-def print_dict_board_debug(board_dict, N):
-    """Print the board dictionary with health and attack power"""
-    for i in range(0, N):
-        for j in range(0, N):
-            print(board_dict[(i, j)], end=" ")
-            try:
-                print(f"{board_dict[(i, j)].health:02} {board_dict[(i, j)].attack_power:02}", end=" ")
-            except Exception:
-                print("      ", end="")
+def print_board_debug(faction_board, health_board):
+    """Print the faction board with health"""
+    for i in range(faction_board.shape[0]):
+        for j in range(faction_board.shape[1]):
+            print(FACTION_SYMBOLS[faction_board[i, j]], end=" ")
+            if faction_board[i, j]:
+                print(f"{health_board[i, j]:02}", end=" ")
+            else:
+                print("   ", end="")
         print()
     print()
 
-def parse_input(file_path):
-    """Parse the input file and return the parameters"""
-    def parse_coordinates(coordinates):
-        """Parse the coordinates"""
-        coordinates = [coord.strip() for coord in coordinates]
-        # coordinates is a list of strings, each string is a coordinate in the form of "x y"
-        return [(int(coord.split()[0]), int(coord.split()[1])) for coord in coordinates]
-
-    def parse_units_coordinates(earth_units_coordinates, fire_units_coordinates, water_units_coordinates, air_units_coordinates):
-        """Parse the units' coordinates"""
-        return (parse_coordinates(earth_units_coordinates), parse_coordinates(fire_units_coordinates),
-            parse_coordinates(water_units_coordinates), parse_coordinates(air_units_coordinates))
-
-    # Read the file
-    with open(file_path, "r") as file:
-        lines = file.readlines()
-        params = lines[0].strip().split()
-        N = int(params[0])
-        wave_count = int(params[1])
-        units_per_wave = int(params[2])
-        rounds_per_wave = int(params[3])
-
-        units_in_waves = {}
-        for i in range(wave_count):
-            units_in_waves[i] = [["." for _ in range(N)] for i in range(N)]
-
-        # Read the grid
-        for i in range(int((len(lines)-1) / 5)):
-            earth_coords = lines[2 + i*5].strip().split(":")[1].strip().split(",")
-            fire_coords = lines[3 + i*5].strip().split(":")[1].strip().split(",")
-            water_coords = lines[4 + i*5].strip().split(":")[1].strip().split(",")
-            air_coords = lines[5 + i*5].strip().split(":")[1].strip().split(",")
-
-            (earth_units_coordinates, fire_units_coordinates,
-             water_units_coordinates, air_units_coordinates) = parse_units_coordinates(
-                earth_coords, fire_coords, water_coords, air_coords
-            )
-
-            for earth_coord in earth_units_coordinates:
-                units_in_waves[i][earth_coord[0]][earth_coord[1]] = "E"
-
-            for fire_coord in fire_units_coordinates:
-                units_in_waves[i][fire_coord[0]][fire_coord[1]] = "F"
-
-            for water_coord in water_units_coordinates:
-                units_in_waves[i][water_coord[0]][water_coord[1]] = "W"
-
-            for air_coord in air_units_coordinates:
-                units_in_waves[i][air_coord[0]][air_coord[1]] = "A"
-
-    # Return the parameters
-    return units_in_waves, N, wave_count, units_per_wave, rounds_per_wave
-
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Simulate the battle of the input file on the MPI ranks.")
+    parser.add_argument("input", nargs="?", default="./io/input1.txt",
+                        help="path of the input file, or of the input directory or manifest in batch mode")
+    parser.add_argument("output", nargs="?", default="./io/output1.txt",
+                        help="path of the output file, or of the output directory in batch mode")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="record the phases and halo messages of every rank to a Chrome trace JSON file")
+    parser.add_argument("--checkpoint-dir", metavar="DIR", help="directory of the checkpoints")
+    parser.add_argument("--checkpoint-waves", type=int, default=0, metavar="K",
+                        help="take a checkpoint before every K-th wave")
+    parser.add_argument("--checkpoint-rounds", type=int, default=0, metavar="K",
+                        help="take a checkpoint after every K-th round, counted over all waves")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue after the latest checkpoint in the checkpoint directory, with any rank count")
+    parser.add_argument("--batch", action="store_true",
+                        help="run every input file of a directory, or listed in a manifest file, on groups of ranks")
+    parser.add_argument("--group-size", type=int, default=5, metavar="RANKS",
+                        help="ranks of a group in batch mode, a manager and its workers")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="text",
+                        help="text board of the symbols, or binary board of the faction, health and attack per cell")
+    parser.add_argument("--parallel-output", action="store_true",
+                        help="let every worker write its grid to the output file with MPI-IO")
+    parser.add_argument("--snapshots", metavar="PATH", help="write the binary board of every wave end to this file")
+    parser.add_argument("--memory-mapped-output", action="store_true",
+                        help="render the text board of the manager straight into a memory-mapped output file")
+    parser.add_argument("--backend", choices=("mpi", "shared"), default="mpi",
+                        help="MPI ranks, or worker processes of this machine over a board in shared memory")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), metavar="COUNT",
+                        help="worker processes of the shared memory backend, run without mpiexec")
+    parser.add_argument("--kernels", choices=KERNELS, default="numpy",
+                        help="NumPy array kernels, or compiled per-cell kernels if Numba is installed")
+    parser.add_argument("--threads", type=int, default=1, metavar="COUNT",
+                        help="threads of every worker rank or process, each runs the phases on a row band of its grid")
+    args = parser.parse_args()
+
+    # the trace, checkpoint and snapshot paths are of a single run, the scenarios of a batch would overwrite them
+    if args.batch:
+        single_run_options = [option for option, value in (("--trace", args.trace),
+                                                           ("--checkpoint-dir", args.checkpoint_dir),
+                                                           ("--checkpoint-waves", args.checkpoint_waves),
+                                                           ("--checkpoint-rounds", args.checkpoint_rounds),
+                                                           ("--resume", args.resume),
+                                                           ("--snapshots", args.snapshots)) if value]
+        if single_run_options:
+            parser.error(f"{', '.join(single_run_options)} cannot be used with --batch")
+
+    selected_worker_type = partial(select_worker_type(args.kernels), threads=args.threads)
+    output_writer = OutputWriter(args.output_format, args.parallel_output, args.snapshots, args.memory_mapped_output)
+    if args.backend == "shared":
+        run_shared(args.input, args.output, args.processes, selected_worker_type)
+    elif args.batch:
+        run_batch(MPI.COMM_WORLD, args.input, args.output, args.group_size,
+                  partial(main, output_writer=output_writer, worker_type=selected_worker_type))
+    else:
+        main(args.input, args.output, args.trace,
+             Checkpointer(args.checkpoint_dir, args.checkpoint_waves, args.checkpoint_rounds), args.resume,
+             output_writer=output_writer, worker_type=selected_worker_type)
@@ -0,0 +1,123 @@
+import numpy as np
+from mpi4py import MPI
+
+from unit import FACTION_SYMBOLS
+
+# Output formats, the text board of the symbols or the binary board of the snapshot records
+OUTPUT_FORMATS = ("text", "binary")
+
+# Byte of every faction symbol, indexed by faction code
+SYMBOL_BYTES = np.frombuffer(FACTION_SYMBOLS.encode(), dtype=np.uint8)
+
+# A cell of the text board is its symbol and the space or the newline after it, so every row has the same width
+TEXT_CELL_BYTES = 2
+
+# A cell of the binary board, the records are packed and little endian
+SNAPSHOT_RECORD = np.dtype([("faction", "i1"), ("health", "<i2"), ("attack_power", "<i2")])
+
+
+def render_text(faction_codes, ends_rows, out=None):
+    """Render the faction codes to the bytes of their cells on the text board, into out if given.
+
+    The last column ends the rows if ends_rows, otherwise every cell is followed by a space.
+    """
+    rows, cols = faction_codes.shape
+    if out is None:
+        out = np.empty((rows, cols * TEXT_CELL_BYTES), dtype=np.uint8)
+    cells = out.reshape(rows, cols, TEXT_CELL_BYTES)
+    cells[:, :, 0] = SYMBOL_BYTES[faction_codes]
+    cells[:, :, 1] = ord(" ")
+    if ends_rows:
+        cells[:, -1, 1] = ord("\n")
+    return out
+
+
+def text_tile(worker):
+    """Render the grid of the worker to the bytes of its cells on the text board."""
+    # the last column of the board ends the row
+    return render_text(worker.faction[worker.grid], worker.board_position[1] + worker.grid_shape[1] == worker.N)
+
+
+def write_text(output_path, faction_board, memory_mapped=False):
+    """Write the text board of the faction codes to the output file in a single pass.
+
+    A memory-mapped output file is rendered in place, so the text of a large board is never held in memory.
+    """
+    rows, cols = faction_board.shape
+    if memory_mapped:
+        out = np.memmap(output_path, dtype=np.uint8, mode="w+", shape=(rows, cols * TEXT_CELL_BYTES))
+        render_text(faction_board, ends_rows=True, out=out)
+        out.flush()
+        del out
+    else:
+        with open(output_path, "wb") as file:
+            file.write(render_text(faction_board, ends_rows=True))
+
+
+def snapshot_tile(worker):
+    """Pack the faction codes, healths and attack powers of the grid of the worker to snapshot records."""
+    tile = np.empty(worker.grid_shape, dtype=SNAPSHOT_RECORD)
+    tile["faction"] = worker.faction[worker.grid]
+    tile["health"] = worker.health[worker.grid]
+    tile["attack_power"] = worker.attack_power[worker.grid]
+    return tile.view(np.uint8).reshape(worker.grid_shape[0], -1)
+
+
+def write_tiles(comm, file_path, N, cell_bytes, tile=None, board_position=(0, 0), offset=0):
+    """Write the tiles of the ranks to their place on a board in a shared file with collective MPI-IO.
+
+    The board has N rows of N cells of cell_bytes bytes and starts at the given byte offset of the file, the
+    file ends with it. A tile is the rows of the bytes of its cells, the ranks without a tile write nothing.
+    """
+    file = MPI.File.Open(comm, file_path, MPI.MODE_WRONLY | MPI.MODE_CREATE)
+    file.Set_size(offset + N * N * cell_bytes)
+
+    if tile is None:
+        file.Set_view(offset, MPI.BYTE, MPI.BYTE)
+        file.Write_all(np.empty(0, dtype=np.uint8))
+    else:
+        # every rank sees only the bytes of its tile on the board
+        file_type = MPI.BYTE.Create_subarray([N, N * cell_bytes], list(tile.shape),
+                                             [board_position[0], board_position[1] * cell_bytes]).Commit()
+        file.Set_view(offset, MPI.BYTE, file_type)
+        file.Write_all(np.ascontiguousarray(tile))
+        file_type.Free()
+
+    file.Close()
+
+
+class OutputWriter:
+    """Writer of the final board and of the optional per-wave snapshots.
+
+    The text board is written by the manager unless the output is parallel, then every worker writes its
+    grid to the output file with MPI-IO, as in the binary format. The manager renders the text board into
+    a memory-mapped output file if memory_mapped. The snapshots keep the binary board of every wave one
+    after the other in a single file, they are always written by the workers.
+    """
+    def __init__(self, output_format="text", parallel=False, snapshot_path=None, memory_mapped=False):
+        self.output_format = output_format
+        self.parallel = parallel or output_format == "binary"
+        self.snapshot_path = snapshot_path
+        self.memory_mapped = memory_mapped
+
+    def write_snapshot(self, comm, N, wave_index, worker=None):
+        """Write the binary board of the wave end to the snapshot file, the manager passes no worker."""
+        if self.snapshot_path is None:
+            return
+
+        tile = snapshot_tile(worker) if worker is not None else None
+        board_position = worker.board_position if worker is not None else (0, 0)
+        write_tiles(comm, self.snapshot_path, N, SNAPSHOT_RECORD.itemsize, tile, board_position,
+                    offset=wave_index * N * N * SNAPSHOT_RECORD.itemsize)
+
+    def write_output(self, comm, N, output_path, worker=None):
+        """Write the final board to the output file in parallel, the manager passes no worker."""
+        render, cell_bytes = ((snapshot_tile, SNAPSHOT_RECORD.itemsize) if self.output_format == "binary"
+                              else (text_tile, TEXT_CELL_BYTES))
+        tile = render(worker) if worker is not None else None
+        board_position = worker.board_position if worker is not None else (0, 0)
+        write_tiles(comm, output_path, N, cell_bytes, tile, board_position)
+
+    def write_board(self, output_path, faction_board):
+        """Write the text board of the gathered faction codes to the output file, only on the manager."""
+        write_text(output_path, faction_board, self.memory_mapped)
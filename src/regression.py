@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+import argparse
+import filecmp
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import mpi4py
+import numpy as np
+
+# the simulations run under mpiexec in subprocesses, this process reads their outputs without joining MPI
+mpi4py.rc.initialize = False
+
+from benchmark import SOURCE_DIR, run_simulation
+from output import SNAPSHOT_RECORD, render_text
+from scenario import write_scenario
+
+# The fixed scenarios of the gate, small enough to run on a few ranks in seconds
+SCENARIOS = (
+    {"name": "uniform_32", "N": 32, "waves": 3, "units": 40, "rounds": 6, "distribution": "uniform", "seed": 1},
+    {"name": "clustered_48", "N": 48, "waves": 3, "units": 120, "rounds": 6, "distribution": "clustered", "seed": 2},
+    {"name": "border_40", "N": 40, "waves": 4, "units": 80, "rounds": 8, "distribution": "border", "seed": 3},
+)
+
+# Configurations whose outputs are checked against the golden boards too, with the arguments they add to main.py.
+# the shared memory backend and the resume from a checkpoint are run by run_configuration
+CONFIGURATIONS = {
+    "threads_3": ["--threads", "3"],
+    "kernels_jit": ["--kernels", "jit"],
+    "parallel_output": ["--parallel-output"],
+    "binary_output": ["--output-format", "binary"],
+    "shared": None,
+    "resume": None,
+}
+
+# Directory of the golden boards and of the baseline file
+REGRESSION_DIR = os.path.join(SOURCE_DIR, "io", "regression")
+
+
+def phase_times(trace_path):
+    """Get the total seconds of every phase of the trace, the slowest rank for each phase."""
+    with open(trace_path) as file:
+        events = json.load(file)["traceEvents"]
+
+    rank_totals = {}
+    for event in events:
+        if event["ph"] == "X":
+            totals = rank_totals.setdefault(event["pid"], {})
+            totals[event["name"]] = totals.get(event["name"], 0) + event["dur"] / 1e6
+
+    times = {}
+    for totals in rank_totals.values():
+        for name, seconds in totals.items():
+            times[name] = max(times.get(name, 0), seconds)
+    return times
+
+
+def measure(scenario, file_path, args, work_dir):
+    """Run the scenario on the ranks of the arguments, return its output path and its metrics of the fastest run."""
+    runs = []
+    for repeat in range(args.repeat):
+        output_path = os.path.join(work_dir, f"{scenario['name']}_output_{repeat}.txt")
+        trace_path = os.path.join(work_dir, f"{scenario['name']}_trace_{repeat}.json")
+        wall_time, peak_rss_kb = run_simulation(args.mpiexec, args.ranks, file_path, work_dir,
+                                                output_path, trace_path)
+        runs.append((output_path, {"wall_time": wall_time, "peak_rss_kb": max(peak_rss_kb),
+                                   "phases": phase_times(trace_path)}))
+
+    return min(runs, key=lambda run: run[1]["wall_time"])
+
+
+def run_configuration(name, scenario, file_path, output_path, args, work_dir):
+    """Run the scenario in the named configuration on the ranks of the arguments, writing its output file."""
+    def run(ranks, *options):
+        launcher = shlex.split(args.mpiexec) + ["-n", str(ranks)] if ranks else []
+        subprocess.run(launcher + [sys.executable, "main.py", file_path, output_path, *options],
+                       cwd=SOURCE_DIR, check=True, stdout=subprocess.DEVNULL)
+
+    if name == "shared":
+        # the shared memory backend runs without mpiexec, with a process for every worker rank
+        run(None, "--backend", "shared", "--processes", str(args.ranks - 1))
+    elif name == "resume":
+        # the only checkpoint is in the middle of the last wave, it is resumed on one more rank
+        checkpoint_dir = os.path.join(work_dir, scenario["name"] + "_checkpoints")
+        every_rounds = (scenario["waves"] - 1) * scenario["rounds"] + scenario["rounds"] // 2
+        run(args.ranks, "--checkpoint-dir", checkpoint_dir, "--checkpoint-rounds", str(every_rounds))
+        os.remove(output_path)
+        run(args.ranks + 1, "--checkpoint-dir", checkpoint_dir, "--resume")
+    else:
+        run(args.ranks, *CONFIGURATIONS[name])
+
+
+def configuration_mismatches(scenario, file_path, golden_path, args, work_dir):
+    """Get the names of the configurations of the arguments whose output differs from the golden board.
+
+    A binary output is compared by the text board of its faction codes.
+    """
+    with open(golden_path, "rb") as file:
+        golden = file.read()
+
+    mismatches = []
+    for name in args.configurations:
+        output_path = os.path.join(work_dir, f"{scenario['name']}_{name}_output")
+        run_configuration(name, scenario, file_path, output_path, args, work_dir)
+        if "--output-format" in (CONFIGURATIONS[name] or []):
+            faction = np.fromfile(output_path, dtype=SNAPSHOT_RECORD)["faction"]
+            output = render_text(faction.reshape(scenario["N"], scenario["N"]), ends_rows=True).tobytes()
+        else:
+            with open(output_path, "rb") as file:
+                output = file.read()
+        if output != golden:
+            mismatches.append(name)
+
+    return mismatches
+
+
+def regressions(metrics, baseline, args):
+    """Get the descriptions of the metrics that are worse than the baseline by more than the tolerance.
+
+    The phases that took less than the minimum time in the baseline are too noisy to compare.
+    """
+    found = []
+    if metrics["peak_rss_kb"] > baseline["peak_rss_kb"] * (1 + args.memory_tolerance):
+        found.append(f"peak memory {baseline['peak_rss_kb']} kB -> {metrics['peak_rss_kb']} kB")
+
+    timings = [("wall time", metrics["wall_time"], baseline["wall_time"])]
+    timings += [(name, metrics["phases"].get(name, 0), seconds) for name, seconds in baseline["phases"].items()]
+    for name, seconds, baseline_seconds in timings:
+        if baseline_seconds >= args.min_time and seconds > baseline_seconds * (1 + args.tolerance):
+            found.append(f"{name} {baseline_seconds:.3f}s -> {seconds:.3f}s")
+
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the outputs, phase timings and peak memory of fixed "
+                                                 "scenarios against the golden boards and the stored baseline.")
+    parser.add_argument("--ranks", type=int, default=3, help="ranks of every run, the manager and its workers")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown of the wall time and of every phase")
+    parser.add_argument("--memory-tolerance", type=float, default=0.1,
+                        help="allowed relative growth of the peak memory of the largest rank")
+    parser.add_argument("--min-time", type=float, default=0.1,
+                        help="phases faster than this many seconds in the baseline are not compared")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every scenario, the fastest one is kept")
+    parser.add_argument("--mpiexec", default="mpiexec", help="the MPI launcher command, -n is appended")
+    parser.add_argument("--configurations", nargs="*", choices=list(CONFIGURATIONS), default=list(CONFIGURATIONS),
+                        help="configurations whose outputs are checked against the golden boards too")
+    parser.add_argument("--regression-dir", default=REGRESSION_DIR,
+                        help="directory of the golden boards and of baseline.json")
+    parser.add_argument("--update", action="store_true",
+                        help="record the outputs and metrics of this run as the new golden boards and baseline")
+    args = parser.parse_args()
+
+    baseline_path = os.path.join(args.regression_dir, "baseline.json")
+    baseline = {"ranks": args.ranks, "scenarios": {}}
+    if not args.update:
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        if baseline["ranks"] != args.ranks:
+            print(f"the baseline was recorded on {baseline['ranks']} ranks, not {args.ranks}")
+            return 1
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as work_dir:
+        for scenario in SCENARIOS:
+            file_path = os.path.join(work_dir, scenario["name"] + ".txt")
+            write_scenario(file_path, scenario["N"], scenario["waves"], scenario["units"], scenario["rounds"],
+                           scenario["distribution"], scenario["seed"])
+            output_path, metrics = measure(scenario, file_path, args, work_dir)
+            golden_path = os.path.join(args.regression_dir, scenario["name"] + "_output.txt")
+
+            if args.update:
+                os.makedirs(args.regression_dir, exist_ok=True)
+                shutil.copyfile(output_path, golden_path)
+                baseline["scenarios"][scenario["name"]] = metrics
+                found = []
+            else:
+                found = regressions(metrics, baseline["scenarios"][scenario["name"]], args)
+                if not filecmp.cmp(output_path, golden_path, shallow=False):
+                    found.insert(0, "the output differs from the golden board")
+
+            # the other configurations only have to give the golden board, their timings are not compared
+            found += [f"the output of the {name} configuration differs from the golden board"
+                      for name in configuration_mismatches(scenario, file_path, golden_path, args, work_dir)]
+
+            failures += bool(found)
+            status = "FAIL" if found else "recorded" if args.update else "ok"
+            print(f"{scenario['name']}: {status}, wall={metrics['wall_time']:.3f}s")
+            for description in found:
+                print(f"    {description}")
+
+    if args.update:
+        with open(baseline_path, "w") as file:
+            json.dump(baseline, file, indent=2)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
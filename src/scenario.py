@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+import argparse
+
+import numpy as np
+
+from unit import FACTION_CODES
+
+# Spatial distributions of the generated units
+DISTRIBUTIONS = ("uniform", "clustered", "border")
+
+
+def cell_weights(N, distribution, rng):
+    """Get the relative probability of every board cell to get a unit in the given distribution."""
+    if distribution == "uniform":
+        return np.ones((N, N))
+
+    rows, cols = np.indices((N, N))
+    if distribution == "clustered":
+        # a few gaussian clusters at random centers, the uniform floor keeps every cell possible
+        weights = np.full((N, N), 1e-3)
+        sigma = max(1.0, N / 16)
+        for center_row, center_col in rng.integers(0, N, size=(max(1, N // 16), 2)):
+            weights += np.exp(-((rows - center_row) ** 2 + (cols - center_col) ** 2) / (2 * sigma ** 2))
+        return weights
+
+    if distribution == "border":
+        # the cells in the band along the board edges are ten times as likely
+        band = max(1, N // 8)
+        edge_distance = np.minimum(np.minimum(rows, N - 1 - rows), np.minimum(cols, N - 1 - cols))
+        return np.where(edge_distance < band, 10.0, 1.0)
+
+    raise ValueError(f"unknown distribution {distribution}, expected one of {DISTRIBUTIONS}")
+
+
+def generate_wave(N, units_per_wave, distribution, rng):
+    """Generate the coordinates of the units of every faction in a wave, the units of a wave are on distinct cells."""
+    weights = cell_weights(N, distribution, rng).ravel()
+    unit_count = min(len(FACTION_CODES) * units_per_wave, N * N)
+    cells = rng.choice(N * N, size=unit_count, replace=False, p=weights / weights.sum())
+
+    return {symbol: [divmod(int(cell), N) for cell in cells[index::len(FACTION_CODES)]]
+            for index, symbol in enumerate(FACTION_CODES)}
+
+
+def write_scenario(file_path, N, wave_count, units_per_wave, rounds_per_wave, distribution="uniform", seed=0):
+    """Write a generated scenario to the given path in the input file format."""
+    rng = np.random.default_rng(seed)
+    with open(file_path, "w") as file:
+        file.write(f"{N} {wave_count} {units_per_wave} {rounds_per_wave}\n")
+        for wave_index in range(wave_count):
+            file.write(f"Wave {wave_index + 1}:\n")
+            for symbol, coordinates in generate_wave(N, units_per_wave, distribution, rng).items():
+                file.write(f"{symbol}: " + ", ".join(f"{row} {col}" for row, col in coordinates) + "\n")
+
+
+def parse_input_header(file_path):
+    """Parse the first line of the input file and return the parameters."""
+    with open(file_path, "r") as file:
+        N, wave_count, units_per_wave, rounds_per_wave = (int(param) for param in file.readline().split())
+    return N, wave_count, units_per_wave, rounds_per_wave
+
+
+def read_waves(file_path):
+    """Read the waves of the input file one by one, yield the (row, column, faction code) rows of their units.
+
+    Only the units of a wave are kept, a later unit of the wave on the same cell replaces the earlier one.
+    """
+    with open(file_path, "r") as file:
+        file.readline()
+        for wave_title in file:
+            if not wave_title.strip():
+                continue
+
+            # the title of the wave is followed by a line of coordinates for every faction
+            units = {}
+            for _ in range(len(FACTION_CODES)):
+                symbol, coordinates = next(file).split(":")
+                for coordinate in coordinates.split(","):
+                    if coordinate.strip():
+                        row, col = coordinate.split()
+                        units[(int(row), int(col))] = FACTION_CODES[symbol.strip()]
+
+            yield np.array([(row, col, code) for (row, col), code in units.items()], dtype=np.int32).reshape(-1, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a scenario in the input file format.")
+    parser.add_argument("output", help="path of the generated input file")
+    parser.add_argument("-N", type=int, default=64, help="board size")
+    parser.add_argument("--waves", type=int, default=4, help="number of waves")
+    parser.add_argument("--units", type=int, default=64, help="units per faction in every wave")
+    parser.add_argument("--rounds", type=int, default=8, help="rounds per wave")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    write_scenario(args.output, args.N, args.waves, args.units, args.rounds, args.distribution, args.seed)
+
+
+if __name__ == "__main__":
+    main()
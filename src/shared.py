@@ -0,0 +1,188 @@
+import multiprocessing
+from multiprocessing import shared_memory
+from threading import BrokenBarrierError
+
+import numpy as np
+
+from decomposition import Decomposition
+from scenario import parse_input_header, read_waves
+from output import write_text
+from unit import NEUTRAL, MAX_HEALTH, ATTACK_POWER, HEALING_RATE
+from worker import Worker
+
+# Arrays of the shared board, the field arrays of the workers and the move directions of the air units
+BOARD_ARRAYS = (("faction", np.int8), ("health", np.int32), ("attack_power", np.int32),
+                ("healing_rate", np.int32), ("move_direction", np.int8))
+
+# Names of the field arrays of a worker, in the order of Worker.field_arrays
+FIELD_ARRAYS = ("faction", "health", "attack_power", "healing_rate")
+
+
+class SharedBoard:
+    """The board arrays in shared memory blocks, created by the manager process and attached by the workers."""
+    def __init__(self, N, block_names=None):
+        self.N = N
+        self.blocks = {}
+        self.arrays = {}
+        for name, dtype in BOARD_ARRAYS:
+            size = N * N * np.dtype(dtype).itemsize
+            if block_names is None:
+                block = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                block = shared_memory.SharedMemory(name=block_names[name])
+            self.blocks[name] = block
+            self.arrays[name] = np.ndarray((N, N), dtype=dtype, buffer=block.buf)
+        if block_names is None:
+            for array in self.arrays.values():
+                array[:] = 0
+
+    def block_names(self):
+        """Get the names the workers attach the shared memory blocks with."""
+        return {name: block.name for name, block in self.blocks.items()}
+
+    def close(self, unlink=False):
+        """Detach the shared memory blocks, the manager unlinks them too."""
+        self.arrays = {}
+        for block in self.blocks.values():
+            block.close()
+            if unlink:
+                block.unlink()
+
+
+def field_block(worker):
+    """Get the board slices of the field cells of the worker that lie on the board, and their field slices."""
+    N = worker.N
+    field_rows, field_cols = worker.faction.shape
+    row_start, col_start = max(0, worker.origin[0]), max(0, worker.origin[1])
+    row_end, col_end = min(N, worker.origin[0] + field_rows), min(N, worker.origin[1] + field_cols)
+    board_cells = (slice(row_start, row_end), slice(col_start, col_end))
+    field_cells = (slice(row_start - worker.origin[0], row_end - worker.origin[0]),
+                   slice(col_start - worker.origin[1], col_end - worker.origin[1]))
+    return board_cells, field_cells
+
+
+def publish(worker, board, names):
+    """Write the grid of the given arrays of the worker to the shared board."""
+    (row_start, col_start), (rows, cols) = worker.board_position, worker.grid_shape
+    for name in names:
+        board.arrays[name][row_start:row_start + rows, col_start:col_start + cols] = getattr(worker, name)[worker.grid]
+
+
+def read_field(worker, board, names):
+    """Read the field of the given arrays of the worker from the shared board, the grid and the halo."""
+    board_cells, field_cells = field_block(worker)
+    for name in names:
+        getattr(worker, name)[field_cells] = board.arrays[name][board_cells]
+
+
+def exchange(worker, board, names, barrier):
+    """Publish the grid of the given arrays and read the grids of the neighbours into the halo.
+
+    The first barrier waits for every grid to be on the board, the second one for every halo to be read, so
+    the next phase does not overwrite a grid a slower worker still reads.
+    """
+    publish(worker, board, names)
+    barrier.wait()
+    read_field(worker, board, names)
+    barrier.wait()
+
+
+def place_wave(board, units):
+    """Place the (row, column, faction code) rows of the new units of a wave on the neutral cells of the board."""
+    rows, cols, codes = units[:, 0], units[:, 1], units[:, 2]
+    free = board.arrays["faction"][rows, cols] == NEUTRAL
+    new_units = (rows[free], cols[free])
+    codes = codes[free]
+    board.arrays["faction"][new_units] = codes
+    board.arrays["health"][new_units] = MAX_HEALTH[codes]
+    board.arrays["attack_power"][new_units] = ATTACK_POWER[codes]
+    board.arrays["healing_rate"][new_units] = HEALING_RATE[codes]
+
+
+def run_worker(worker_index, decomposition, block_names, wave_count, rounds_per_wave, barrier, wave_barrier,
+               worker_type=Worker):
+    """Simulate the grid of the worker with the given index, the halo is read from the shared board.
+
+    The manager places the units of every wave on the board between the two waits on the wave barrier.
+    """
+    board = SharedBoard(decomposition.N, block_names)
+    worker = worker_type(worker_index + 1, decomposition)
+    try:
+        for _ in range(wave_count):
+            # the new units of the wave are on the board
+            wave_barrier.wait()
+            read_field(worker, board, FIELD_ARRAYS)
+
+            for _ in range(rounds_per_wave):
+                # ------- MOVE PHASE -------
+                worker.move_phase(interior=True)
+                worker.move_phase(interior=False)
+                exchange(worker, board, ("move_direction",), barrier)
+
+                move_packs = np.concatenate((worker.collect_moves(interior=True),
+                                             worker.collect_moves(interior=False)))
+                worker.resolve_moves(move_packs)
+                exchange(worker, board, FIELD_ARRAYS, barrier)
+
+                # ------- ACTION PHASE -------
+                action_packs = np.concatenate((worker.action_phase(interior=True),
+                                               worker.action_phase(interior=False)))
+                worker.resolve_actions(action_packs)
+                exchange(worker, board, FIELD_ARRAYS, barrier)
+
+            # ------- FLOOD PHASE -------
+            flood_packs = np.concatenate((worker.flood_phase(interior=True), worker.flood_phase(interior=False)))
+            worker.resolve_floods(flood_packs)
+            worker.reset_attack_powers()
+
+            # the grid at the wave end is on the board
+            publish(worker, board, FIELD_ARRAYS)
+            wave_barrier.wait()
+    except BaseException:
+        # the other processes would wait for this one forever
+        barrier.abort()
+        wave_barrier.abort()
+        raise
+    finally:
+        board.close()
+
+
+def run_shared(file_path, output_path, process_count, worker_type=Worker):
+    """Simulate the battle of the input file on worker processes of this machine over a board in shared memory.
+
+    The workers run the phases of the MPI workers on the same grids, but read their halo from the board between
+    barriers instead of exchanging messages. The grid bounds stay the same for the whole simulation.
+    """
+    N, wave_count, units_per_wave, rounds_per_wave = parse_input_header(file_path)
+    decomposition = Decomposition.for_worker_count(N, process_count)
+    board = SharedBoard(N)
+
+    barrier = multiprocessing.Barrier(decomposition.worker_count)
+    wave_barrier = multiprocessing.Barrier(decomposition.worker_count + 1)
+    processes = [multiprocessing.Process(target=run_worker,
+                                         args=(worker_index, decomposition, board.block_names(), wave_count,
+                                               rounds_per_wave, barrier, wave_barrier, worker_type))
+                 for worker_index in range(decomposition.worker_count)]
+    for process in processes:
+        process.start()
+
+    try:
+        waves = read_waves(file_path)
+        for _ in range(wave_count):
+            # the waves missing from the input file are run without new units
+            place_wave(board, next(waves, np.empty((0, 3), dtype=np.int32)))
+            # let the workers simulate the wave, then wait for its end
+            wave_barrier.wait()
+            wave_barrier.wait()
+
+        write_text(output_path, board.arrays["faction"])
+    except BaseException as error:
+        # the workers would wait for the manager forever
+        wave_barrier.abort()
+        if isinstance(error, BrokenBarrierError):
+            raise RuntimeError("a worker process of the shared memory backend failed") from None
+        raise
+    finally:
+        for process in processes:
+            process.join()
+        board.close(unlink=True)
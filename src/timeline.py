@@ -0,0 +1,93 @@
+import inspect
+import json
+from contextlib import contextmanager
+from functools import wraps
+
+from mpi4py import MPI
+
+
+class Timeline:
+    """Recorder of the phases and the halo messages of a rank as Chrome trace events, only if enabled.
+
+    The timestamps are the microseconds since the barrier every rank passes when its timeline is created, so
+    the timelines of the ranks line up when they are merged. Every rank is one process of the trace.
+    """
+    def __init__(self, comm, enabled=False):
+        self.comm = comm
+        self.enabled = enabled
+        self.rank = comm.Get_rank()
+        self.events = []
+        # total bytes of the halo messages by neighbour rank
+        self.bytes_sent = {}
+        self.bytes_received = {}
+        if enabled:
+            comm.Barrier()
+        self.start = MPI.Wtime()
+
+    def _now(self):
+        """Get the microseconds since the timeline was created."""
+        return (MPI.Wtime() - self.start) * 1e6
+
+    @contextmanager
+    def phase(self, name, **args):
+        """Record the wall time of the block as a complete event with the given name and arguments."""
+        if not self.enabled:
+            yield
+            return
+
+        start = self._now()
+        try:
+            yield
+        finally:
+            self.events.append({"name": name, "ph": "X", "ts": start, "dur": self._now() - start,
+                                "pid": self.rank, "tid": 0, "args": args})
+
+    def messages(self, sent, received):
+        """Add the bytes sent to and received from the neighbour ranks, record the totals as counter events."""
+        if not self.enabled:
+            return
+
+        for totals, counts, name in ((self.bytes_sent, sent, "bytes sent"),
+                                     (self.bytes_received, received, "bytes received")):
+            for neighbour_rank, byte_count in counts.items():
+                totals[neighbour_rank] = totals.get(neighbour_rank, 0) + byte_count
+            self.events.append({"name": name, "ph": "C", "ts": self._now(), "pid": self.rank,
+                                "args": {f"rank {neighbour_rank}": total for neighbour_rank, total in totals.items()}})
+
+    def instrument(self, worker):
+        """Record every call of the public methods of the worker as a phase, return the worker."""
+        if not self.enabled:
+            return worker
+
+        for name, method in inspect.getmembers(worker, inspect.ismethod):
+            if not name.startswith("_"):
+                setattr(worker, name, self._timed(f"{type(worker).__name__}.{name}", method))
+        return worker
+
+    def _timed(self, name, method):
+        """Wrap the method to record its calls as a phase."""
+        @wraps(method)
+        def timed(*args, **kwargs):
+            with self.phase(name):
+                return method(*args, **kwargs)
+        return timed
+
+    def write(self, file_path, root=0):
+        """Merge the events of every rank on the root rank and write them as a Chrome trace JSON file."""
+        if not self.enabled:
+            return
+
+        rank_events = self.comm.gather((self.events, self.bytes_sent, self.bytes_received), root=root)
+        if self.rank != root:
+            return
+
+        trace_events = []
+        message_totals = {}
+        for rank, (events, bytes_sent, bytes_received) in enumerate(rank_events):
+            process_name = "manager" if rank == root else f"worker {rank}"
+            trace_events.append({"name": "process_name", "ph": "M", "pid": rank, "args": {"name": process_name}})
+            trace_events += events
+            message_totals[f"rank {rank}"] = {"bytes_sent": bytes_sent, "bytes_received": bytes_received}
+
+        with open(file_path, "w") as file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms", "otherData": message_totals}, file)
@@ -1,402 +1,485 @@
-from typing import Dict
-from unit import EarthUnit, FireUnit, WaterUnit, AirUnit
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 
-class Worker:
-    """Worker class"""
-    def __init__(self, rank: int, grid_size: int, grid_edge_length: int, N: int):
-        self.rank = rank
-        self.grid_size = grid_size
-        self.grid_edge_length = grid_edge_length
-        self.field = {}
-        self.N = N
-        self.grid_position = ( (rank-1)//grid_edge_length, (rank-1)%grid_edge_length )
-        # board position of the top left corner of the grid
-        self.board_position = (self.grid_position[0]*grid_size, self.grid_position[1]*grid_size)
-
-    @staticmethod
-    def _create_unit(unit_type: str, coordinate: (int, int), N):
-        """Create a unit based on the given unit type and coordinate."""
-        if unit_type == "E":
-            return EarthUnit(coordinate, N)
-        elif unit_type == "F":
-            return FireUnit(coordinate, N)
-        elif unit_type == "W":
-            return WaterUnit(coordinate, N)
-        elif unit_type == "A":
-            return AirUnit(coordinate, N)
-        else:
-            return "." # neutral cell
+import numpy as np
 
-    def decide_region(self, row, col):
-        """Decide the region of the given row and column in the grid."""
+from unit import (NEUTRAL, EARTH, FIRE, WATER, AIR, MAX_HEALTH, ATTACK_POWER, HEALING_RATE, ATTACK_DIRECTIONS,
+                  FireUnit, AirUnit)
 
-        # region 3
-        if (( self.board_position[0] + 3 <= row <= self.board_position[0] + self.grid_size - 4 ) and
-                ( self.board_position[1] + 3 <= col <= self.board_position[1] + self.grid_size - 4 )):
-            return 3
+# Width of the halo kept around the grid of a worker
+HALO = 3
 
-        # region 2
-        if (( self.board_position[0] <= row <= self.board_position[0] + self.grid_size - 1 ) and
-                ( self.board_position[1] <= col <= self.board_position[1] + self.grid_size - 1 )):
-            return 2
+# Distance of the farthest cell the result of the action phase on a cell depends on, the air attackers of a unit
+# are 2 cells away and the fire units 1 cell away from it gain attack power if it dies
+ACTION_REACH = 3
 
-        # region 1
-        if (row,col) in self.field:
-            return 1
+# Distance of the farthest cell the move of an air unit depends on, the enemies 2 cells away from its neighbours
+MOVE_REACH = 3
 
-        # out of bounds
-        return 82
+# Move direction of a cell without a moving air unit, the others index the 3x3 neighbourhood in row order
+NO_MOVE = -1
+STAY = 4
 
-    def receive_wave_info(self, new_field: Dict[tuple, str]):
-        """Receive wave info from the manager. Initialize or discard conflicts."""
-        if len(self.field.keys()) == 0:
-            for k,v in new_field.items():
-                self.field[k] = self._create_unit(v, k, self.N)
-        else:
-            for k,v in new_field.items():
-                if k in self.field and self.field[k] != v: # the newly received field info conflicts with the existing one
-                    if self.field[k] == ".":
-                        self.field[k] = self._create_unit(v, k, self.N)
-                    else:
-                        pass # ignore the new info
-
-                else:
-                    if k not in self.field:
-                        print("MAJOR MISTAKE")
-
-    def move_phase(self):
-        """Create the move packs for the units in the grid."""
-        packs = []
-        for coord, unit in self.field.items():
-            if isinstance(unit, AirUnit) and (self.decide_region(coord[0], coord[1]) == 3 or self.decide_region(coord[0], coord[1]) == 2):
-                surroundings = {}
-                for i in range(coord[0]-3, coord[0]+4):
-                    for j in range(coord[1]-3, coord[1]+4):
-                        surroundings[(i, j)] = self.field.get((i, j))
-
-                packs.append(unit.move(surroundings))
-
-        return packs
+# Units a thread of the pool gets at least, the phases with fewer units per thread run on the calling thread
+MIN_BAND_UNITS = 256
 
-    def get_neighbour_worker_ranks(self):
-        """Get the ranks of the neighbouring workers."""
-        neighbour_ranks = []
-        if self.grid_position[0] > 0:
-            neighbour_ranks.append(self.rank - self.grid_edge_length)
-        if self.grid_position[0] < self.grid_edge_length - 1:
-            neighbour_ranks.append(self.rank + self.grid_edge_length)
-        if self.grid_position[1] > 0:
-            neighbour_ranks.append(self.rank - 1)
-        if self.grid_position[1] < self.grid_edge_length - 1:
-            neighbour_ranks.append(self.rank + 1)
-
-        # diagonal neighbours
-        if self.grid_position[0] > 0 and self.grid_position[1] > 0:
-            neighbour_ranks.append(self.rank - self.grid_edge_length - 1)
-        if self.grid_position[0] > 0 and self.grid_position[1] < self.grid_edge_length - 1:
-            neighbour_ranks.append(self.rank - self.grid_edge_length + 1)
-        if self.grid_position[0] < self.grid_edge_length - 1 and self.grid_position[1] > 0:
-            neighbour_ranks.append(self.rank + self.grid_edge_length - 1)
-        if self.grid_position[0] < self.grid_edge_length - 1 and self.grid_position[1] < self.grid_edge_length - 1:
-            neighbour_ranks.append(self.rank + self.grid_edge_length + 1)
+# Records of the packs, the cells are field indices. the packs of a phase are kept in one contiguous array
+MOVE_PACK = np.dtype([("from", np.int32, 2), ("to", np.int32, 2), ("health", np.int32),
+                      ("attack_power", np.int32), ("healing_rate", np.int32)])
+ACTION_PACK = np.dtype([("type", np.int8), ("from", np.int32, 2), ("to", np.int32, 2), ("attack_power", np.int32)])
+FLOOD_PACK = np.dtype([("from", np.int32, 2), ("to", np.int32, 2), ("attack_power", np.int32)])
 
-        return neighbour_ranks
+# Types of the action packs, a heal pack is from and to the healing unit
+ATTACK = 0
+HEAL = 1
 
-    def resolve_moves(self, every_neighbour_move, move_packs):
-        """Resolve the moves of the units in the grid."""
-        moving_coordinates = {}
-        for coord in self.field.keys():
-            moving_coordinates[coord] = []
-
-        for neighbour_rank, neighbour_moves in every_neighbour_move.items():
-            for neighbour_move in neighbour_moves:
-                if neighbour_move["to"] in self.field:
-                    moving_coordinates[neighbour_move["to"]].append(neighbour_move)
-
-        # moves that are leaving the grid
-        leaving_moves = []
-        for move in move_packs:
-            if move["to"] in self.field:
-                moving_coordinates[move["to"]].append(move)
-            elif move["from"] in self.field and move["to"] not in self.field:
-                print("NO ONE SHOULD LEAVE", move)
-                leaving_moves.append(move)
-
-        for to_coord, moves in moving_coordinates.items():
-            if len(moves) == 0:
-                continue
 
-            # make the move if the length of the move list is 1
-            if len(moves) == 1:
-                if moves[0]["to"] in self.field.keys():
-
-                    # if the "from" coordinate is in the field, then move the unit
-                    if moves[0]["from"] in self.field.keys():
-
-                        self.field[to_coord] = self.field[moves[0]["from"]]
-                        if moves[0]["from"] != to_coord:
-                            self.field[moves[0]["from"]] = "."
-                        self.field[to_coord].coordinate = to_coord
-
-                    # else, the unit is coming from a neighbour worker, so create the unit
-                    else:
-                        self.field[to_coord] = self._create_unit("A", to_coord, self.N)
-                        # update the unit's stats
-                        self.field[to_coord].health = moves[0]["health"]
-                        self.field[to_coord].attack_power = moves[0]["attack_power"]
-                        self.field[to_coord].healing_rate = moves[0]["health_rate"]
-
-            # combine the units if the length of the move list is greater than 1
-            else:
-                combined_unit = self.combine_air_units_while_moving(moves)
-                if combined_unit.coordinate == to_coord:
-                    self.field[to_coord] = combined_unit
-                for move in moves:
-                    if move["from"] in self.field.keys():
-                        self.field[move["from"]] = "."
-
-        # move the units that are leaving the grid
-        for move in leaving_moves:
-            self.field[move["from"]] = "."
-
-    def combine_air_units_while_moving(self, move_packs):
-        """Combine the air units while moving if they are moving to the same cell."""
-        units = []
-        for move in move_packs:
-            if self.field[move["from"]] not in self.field.keys():
-                new_unit = self._create_unit("A", move["from"], self.N)
-                new_unit.attack_power = move["attack_power"]
-                new_unit.health = move["health"]
-                new_unit.healing_rate = move["health_rate"]
-                units.append(new_unit)
-
-            else:
-                units.append(self.field[move["from"]])
-
-        attack_power = 0
-        health = 0
-        for unit in units:
-            attack_power += unit.attack_power
-            health += unit.health
-            if health > unit.max_health:
-                health = unit.max_health
-
-        combined_unit = AirUnit(move_packs[0]["to"], self.N)
-        combined_unit.attack_power = attack_power
-        combined_unit.health = health
-
-        return combined_unit
+def dilate(mask, radius):
+    """Grow the mask by the given number of cells in every direction, diagonals included."""
+    grown_rows = mask.copy()
+    for i in range(1, radius + 1):
+        grown_rows[i:] |= mask[:-i]
+        grown_rows[:-i] |= mask[i:]
+    grown = grown_rows.copy()
+    for j in range(1, radius + 1):
+        grown[:, j:] |= grown_rows[:, :-j]
+        grown[:, :-j] |= grown_rows[:, j:]
+    return grown
 
-    def get_r2_r3(self):
-        """Get the units in regions 2 and 3."""
-        r2_r3 = []
-        for coord, unit in self.field.items():
-            if self.decide_region(coord[0], coord[1]) == 2 or self.decide_region(coord[0], coord[1]) == 3:
-                r2_r3.append((coord, unit))
-
-        return r2_r3
-
-    def filter_moves(self, move_packs):
-        """Filter the move packs based on the regions."""
-        filtered_packs = []
-        for move_pack in move_packs:
-            if (self.decide_region(move_pack["to"][0], move_pack["to"][1]) == 3
-                    and self.decide_region(move_pack["from"][0], move_pack["from"][1]) == 3):
-                continue
-            filtered_packs.append(move_pack)
-
-        return filtered_packs
-
-    def filter_actions(self, action_packs):
-        """Filter the action packs based on the regions."""
-        filtered_packs = []
-        for action_pack in action_packs:
-            if action_pack["type"] == "attack":
-                if (self.decide_region(action_pack["to"][0], action_pack["to"][1]) == 3
-                        and self.decide_region(action_pack["from"][0], action_pack["from"][1]) == 3):
-                    continue
-
-            elif action_pack["type"] == "heal":
-                if self.decide_region(action_pack["coord"][0], action_pack["coord"][1]) == 3:
-                    continue
 
-            filtered_packs.append(action_pack)
+@lru_cache(maxsize=None)
+def thread_pool(threads):
+    """Get the pool of the given number of threads, it is shared by the workers of the process."""
+    return ThreadPoolExecutor(max_workers=threads)
 
-        return filtered_packs
 
-    def filter_floods(self, flood_packs):
-        """Filter the flood packs based on the regions."""
-        filtered_packs = []
-        for flood_pack in flood_packs:
-            if flood_pack["to"] is None:
-                continue
-            if self.decide_region(flood_pack["to"][0], flood_pack["to"][1]) == 3:
+class Worker:
+    """Worker class"""
+    def __init__(self, rank: int, decomposition, threads: int = 1):
+        self.rank = rank
+        # the phases split the units of the grid into row bands, one for each thread
+        self.threads = threads
+        self.decomposition = decomposition
+        self.N = N = decomposition.N
+        self.grid_position = decomposition.grid_position(rank - 1)
+        (row_start, row_end), (col_start, col_end) = decomposition.grid_bounds(self.grid_position)
+        # board position of the top left corner of the grid, and the number of its rows and columns
+        self.board_position = (row_start, col_start)
+        self.grid_shape = (row_end - row_start, col_end - col_start)
+        rows, cols = self.grid_shape
+        # board position of the top left corner of the field, the grid and its halo
+        self.origin = (self.board_position[0] - HALO, self.board_position[1] - HALO)
+
+        # the field is stored as one array per unit attribute, neutral cells have the faction code 0
+        field_shape = (rows + 2*HALO, cols + 2*HALO)
+        self.faction = np.zeros(field_shape, dtype=np.int8)
+        self.health = np.zeros(field_shape, dtype=np.int32)
+        self.attack_power = np.zeros(field_shape, dtype=np.int32)
+        self.healing_rate = np.zeros(field_shape, dtype=np.int32)
+        self.field_arrays = (self.faction, self.health, self.attack_power, self.healing_rate)
+
+        # move directions of the air units, the halo holds the directions decided by the neighbours
+        self.move_direction = np.full(field_shape, NO_MOVE, dtype=np.int8)
+
+        # mask of the field cells that lie on the board
+        board_rows = np.arange(field_shape[0]) + self.origin[0]
+        board_cols = np.arange(field_shape[1]) + self.origin[1]
+        self.on_board = ((0 <= board_rows) & (board_rows < N))[:, None] & ((0 <= board_cols) & (board_cols < N))[None, :]
+
+        # the part of the field covered by the grid, regions 2 and 3
+        self.grid = (slice(HALO, HALO + rows), slice(HALO, HALO + cols))
+        # the grid and the first ring of the halo, the cells that units in the grid move to or flood
+        self.reach = (slice(HALO - 1, HALO + rows + 1), slice(HALO - 1, HALO + cols + 1))
+
+        # region of every field cell. region 3 is the interior of the grid, its phases do not read the halo and
+        # can run while it arrives. region 2 is the border of the grid and region 1 is the halo
+        self.region = np.ones(field_shape, dtype=np.int8)
+        self.region[self.grid] = 2
+        self.region[2*HALO:rows, 2*HALO:cols] = 3
+
+        # flat field indices of the cells of every region, the phases only visit these.
+        # the border reach adds the first ring of region 1 to region 2
+        self.region_cells = {region: np.flatnonzero(self.region == region) for region in (1, 2, 3)}
+        border_reach_mask = np.zeros(field_shape, dtype=bool)
+        border_reach_mask[self.reach] = True
+        self.border_reach_cells = np.flatnonzero(border_reach_mask & (self.region != 3))
+        self.reach_cells = np.flatnonzero(border_reach_mask)
+        self.halo_ring_cells = np.flatnonzero(border_reach_mask & (self.region == 1))
+        # the cells of the reach whose attackable enemy counts read the halo, an air unit attacks 2 cells away,
+        # and the flat field indices of their first and second cells in every direction
+        self.halo_reading_cells = np.flatnonzero(border_reach_mask & dilate(self.region == 1, 2))
+        steps = np.array([i*field_shape[1] + j for i, j in AirUnit.attack_directions])[:, None]
+        self.halo_reading_targets = (self.halo_reading_cells + steps, self.halo_reading_cells + 2*steps)
+
+        # the field before the last action phase and the cells it changed. the action phase only visits the
+        # cells near a change, the others would do what they did in the last one, which changed nothing
+        self.action_snapshot = None
+        self.action_changed = None
+
+        # the faction codes at the last move phase and the cells near a change since then. the air units far
+        # from a change stay where they stayed in the last move phase, only the others decide their moves
+        self.move_snapshot = None
+        self.move_active = None
+        # the attackable enemy counts of the round and the number of air units that decided a move in it
+        self.attackable_enemies = None
+        self.deciding_units = 0
+
+        # the last halo strips sent to and received from every neighbour, an unchanged strip is not sent again
+        self.halo_cache = {"sent": {}, "received": {}}
+
+    def _units_in(self, cells, code=None):
+        """Get the field indices of the units, or the units of the given faction, in the given flat field indices."""
+        factions = self.faction.ravel()[cells]
+        cells = cells[factions != NEUTRAL] if code is None else cells[factions == code]
+        return np.unravel_index(cells, self.faction.shape)
+
+    def _place_unit(self, cell, code, health, attack_power, healing_rate):
+        """Place a unit with the given stats to the given field index."""
+        self.faction[cell] = code
+        self.health[cell] = health
+        self.attack_power[cell] = attack_power
+        self.healing_rate[cell] = healing_rate
+
+    def _clear_cell(self, cell):
+        """Turn the given field index into a neutral cell."""
+        self._place_unit(cell, NEUTRAL, 0, 0, 0)
+
+    def _map_bands(self, kernel, rows, cols):
+        """Run the kernel on the units in the given field indices, split into row bands of the field that the
+        threads take one each. Return the results of the bands in row order.
+
+        The units are in row order, so every band is a run of rows of the field. The kernels only write the
+        cells of their own units, NumPy releases the GIL in the array operations and the compiled kernels
+        release it entirely.
+        """
+        bands = min(self.threads, len(rows) // MIN_BAND_UNITS)
+        if bands <= 1:
+            return [kernel(rows, cols)]
+
+        return list(thread_pool(self.threads).map(lambda band: kernel(rows[band], cols[band]),
+                                                  np.array_split(np.arange(len(rows)), bands)))
+
+    def receive_wave_info(self, units: np.ndarray):
+        """Receive wave info from the manager, the (row, column, faction code) rows of the new units in the field.
+
+        Place the new units on neutral cells, discard conflicts.
+        """
+        rows, cols, codes = units[:, 0] - self.origin[0], units[:, 1] - self.origin[1], units[:, 2]
+        free = self.faction[rows, cols] == NEUTRAL
+        new_units = (rows[free], cols[free])
+        codes = codes[free]
+        self.faction[new_units] = codes
+        self.health[new_units] = MAX_HEALTH[codes]
+        self.attack_power[new_units] = ATTACK_POWER[codes]
+        self.healing_rate[new_units] = HEALING_RATE[codes]
+
+    def move_phase(self, interior):
+        """Decide the move directions of the air units in region 3, or in region 2."""
+        rows, cols = self._deciding_air_units(interior)
+        if len(rows):
+            # the attackable enemies of every cell of the reach, counted once per round
+            self.attackable_enemies = self.attackable_enemy_counts(None if interior else self.attackable_enemies)
+            self._map_bands(partial(self.decide_moves, attackable_enemies=self.attackable_enemies), rows, cols)
+
+        if not interior:
+            self.attackable_enemies = None
+        return self.move_direction
+
+    def _deciding_air_units(self, interior):
+        """Get the field indices of the air units in region 3, or in region 2, that decide their moves.
+
+        An air unit with no change within MOVE_REACH cells since the last move phase stays where it stayed then,
+        and keeps no move direction. The halo is up to date in the second call, every halo cell reaches the
+        whole border.
+        """
+        cells = self.region_cells[3 if interior else 2]
+        if self.move_snapshot is not None:
+            if interior:
+                changed = self.faction != self.move_snapshot
+                self.move_active = (dilate(changed, MOVE_REACH) if changed.any() else changed).ravel()
+            elif np.any(self.faction.ravel()[self.region_cells[1]] != self.move_snapshot.ravel()[self.region_cells[1]]):
+                self.move_active[cells] = True
+            cells = cells[self.move_active[cells]]
+
+        rows, cols = self._units_in(cells, AIR)
+        self.deciding_units = len(rows) + (0 if interior else self.deciding_units)
+        if not interior:
+            self.move_snapshot = self.faction.copy()
+        return rows, cols
+
+    def decide_moves(self, rows, cols, attackable_enemies):
+        """Decide the move directions of the air units in the given field indices."""
+        # every unit checks the neutral neighbours in row order, ties keep the lexicographically smaller earlier
+        # position, so a neighbour is only taken if it beats the unit cell and every neighbour before it
+        best_attackable = attackable_enemies[rows, cols]
+        best_direction = np.full(len(rows), STAY, dtype=np.int8)
+        for direction in range(9):
+            i, j = direction // 3 - 1, direction % 3 - 1
+            if direction == STAY:
                 continue
-            filtered_packs.append(flood_pack)
 
-        return filtered_packs
+            to_rows, to_cols = rows + i, cols + j
+            free = self.on_board[to_rows, to_cols] & (self.faction[to_rows, to_cols] == NEUTRAL)
 
-    def action_phase(self):
-        """Create the action packs for the units in the grid."""
-        actions_packs = []
-        for coord, unit in self.field.items():
+            # the cell the air unit leaves counts as a neutral cell, the unit can attack over it from the neighbour
+            behind = self.faction[rows - i, cols - j]
+            attackable = attackable_enemies[to_rows, to_cols] + ((behind != NEUTRAL) & (behind != AIR))
 
-            # if the unit is not in region 2 or 3, skip
-            if not(self.decide_region(coord[0], coord[1]) == 2) and not(self.decide_region(coord[0], coord[1]) == 3):
-                continue
+            better = free & (attackable > best_attackable)
+            best_attackable = np.where(better, attackable, best_attackable)
+            best_direction[better] = direction
 
-            if (isinstance(unit, EarthUnit) or isinstance(unit, FireUnit)
-                    or isinstance(unit, WaterUnit) or isinstance(unit, AirUnit)):
+        self.move_direction[rows, cols] = best_direction
 
-                # if the units health is below 50 percent, heal
-                if unit.health < (unit.max_health / 2):
-                    actions_packs.append(unit.get_healing_pack())
-                    continue
+    def attackable_enemy_counts(self, attackable_enemies=None):
+        """Count the enemies an air unit would attack from every cell of the reach, with the field as it is.
 
-                # then look for the attackable enemies and either heal or attack
-                surroundings = {}
-                for attack_direction in unit.attack_pattern():
-                    attack_position = (coord[0] + attack_direction[0], coord[1] + attack_direction[1])
-
-                    # if the unit is an air unit, check enlarged attack positions
-                    if isinstance(unit, AirUnit):
-                        if self.field[attack_position] == ".":
-                            attack_direction = (2 * attack_direction[0], 2 * attack_direction[1])
-                            attack_position = (coord[0] + attack_direction[0], coord[1] + attack_direction[1])
-
-                    # if the attack position is out of bounds, skip
-                    if attack_position[0] < 0 or attack_position[0] >= self.N or attack_position[1] < 0 or attack_position[1] >= self.N:
-                        continue
-
-                    surroundings[attack_position] = self.field.get(attack_position)
-
-                actions_packs += unit.action(surroundings)
-
-        return actions_packs
-
-    def resolve_actions(self, neighbour_action_packs, action_packs):
-        """Resolve the actions of the units in the grid."""
-        target_action_coords = {}
-
-        for coord in self.field.keys():
-            target_action_coords[coord] = {
-                "attacks": [],
-                "heal": None
-            }
-
-        # get the attack and heal actions of the neighbouring workers
-        for neighbour_rank, neighbour_actions in neighbour_action_packs.items():
-            for neighbour_action in neighbour_actions:
-                if neighbour_action["type"] == "attack":
-                    if neighbour_action["to"] in self.field:
-                        target_action_coords[neighbour_action["to"]]["attacks"].append(neighbour_action)
-                elif neighbour_action["type"] == "heal":
-                    if neighbour_action["coord"] in self.field:
-                        target_action_coords[neighbour_action["coord"]]["heal"] = neighbour_action
-
-        # get the attack and heal actions of the units in the grid
-        for action_pack in action_packs:
-            if action_pack["type"] == "attack":
-                target_action_coords[action_pack["to"]]["attacks"].append(action_pack)
-            elif action_pack["type"] == "heal":
-                target_action_coords[action_pack["coord"]]["heal"] = action_pack
-
-        # perform the actions
-        for field_coord, target_action_dict in target_action_coords.items():
-            if self.field[field_coord] != ".":
-                self.perform_action_single_coord(field_coord, target_action_dict)
-
-    def perform_action_single_coord(self, field_coord, target_action_dict):
-        """Perform the action on the unit in the given field coordinate."""
-        total_hit = 0
-        fires = [] # store the fire units for inferno
-        victim = self.field[field_coord]
-
-        # attack actions
-        for attack in target_action_dict["attacks"]:
-            is_attacker_in_field = attack["from"] in self.field
-
-            if not is_attacker_in_field or self.field[attack["from"]] == ".":
-                pass
-
-            else:
-                attacker = self.field[attack["from"]]
-                if attacker.faction == "Fire":
-                    fires.append(attacker)
-
-            # save the attack power to calculate the total hit
-            attack_power = attack["attack_power"]
-
-            total_hit += attack_power
-
-        if victim.faction == "Earth": # earth units special ability
-            total_hit = total_hit // 2
-        victim.health -= total_hit
-
-        if victim.health <= 0:
-            self.field[field_coord] = "."
-            for fire in fires: # if the victim dies, the fire units in the attack list should perform inferno
-                fire.inferno()
-
-        # heal action
-        if target_action_dict["heal"] is not None: # if there is a heal action
-            if victim != ".": # if the unit is still alive
-                victim.heal()
-
-    def flood_phase(self):
-        """Create the flood packs for the units in the grid."""
-        flood_packs = []
-        for coord, unit in self.field.items():
-            if isinstance(unit, WaterUnit):
-                if (self.decide_region(coord[0], coord[1]) == 3) or (self.decide_region(coord[0], coord[1]) == 2):
-                    surroundings = {}
-                    for i in range(coord[0]-1, coord[0]+2):
-                        for j in range(coord[1]-1, coord[1]+2):
-                            if i < 0 or i >= self.N or j < 0 or j >= self.N:
-                                continue
-                            surroundings[(i, j)] = self.field.get((i, j))
-
-                    flood_packs.append(unit.flood(surroundings))
+        An air unit attacks the first cell in every direction, or the second one if the first is neutral, and
+        its enemies are the units of the other factions. The cells out of the board are neutral. Given the
+        counts of the first move call of the round, only the cells that read the halo are counted again.
+        """
+        enemies = (self.faction != NEUTRAL) & (self.faction != AIR)
+        neutral = self.faction == NEUTRAL
+        if attackable_enemies is not None:
+            first, second = self.halo_reading_targets
+            attackable_enemies.ravel()[self.halo_reading_cells] = (
+                enemies.ravel()[first] | (neutral.ravel()[first] & enemies.ravel()[second])).sum(axis=0)
+            return attackable_enemies
 
-        return flood_packs
+        rows, cols = self.faction.shape
 
-    def resolve_floods(self, every_neighbour_flood, flood_packs):
-        """Resolve the floods of the units in the grid."""
-        flood_coordinates = {}
+        # the counts of the cells at least 2 cells away from the field edge, the reach is within them
+        attackable_enemies = np.zeros(self.faction.shape, dtype=np.int32)
+        cells = (slice(2, rows - 2), slice(2, cols - 2))
+        for i, j in AirUnit.attack_directions:
+            first = (slice(2 + i, rows - 2 + i), slice(2 + j, cols - 2 + j))
+            second = (slice(2 + 2*i, rows - 2 + 2*i), slice(2 + 2*j, cols - 2 + 2*j))
+            attackable_enemies[cells] += enemies[first] | (neutral[first] & enemies[second])
 
-        for coord in self.field.keys():
-            flood_coordinates[coord] = []
+        return attackable_enemies
 
-        # Neighbour floods
-        for neighbour_rank, neighbour_floods in every_neighbour_flood.items():
-            for neighbour_flood in neighbour_floods:
-                if neighbour_flood["to"] in self.field:
-                    flood_coordinates[neighbour_flood["to"]].append(neighbour_flood)
+    def get_neighbour_worker_ranks(self):
+        """Get the ranks of the neighbouring workers by their (row, column) direction."""
+        neighbour_ranks = {}
+        for i in range(-1, 2):
+            for j in range(-1, 2):
+                row, col = self.grid_position[0] + i, self.grid_position[1] + j
+                if (i, j) == (0, 0) or not (0 <= row < self.decomposition.dims[0] and
+                                            0 <= col < self.decomposition.dims[1]):
+                    continue
+                neighbour_ranks[(i, j)] = self.decomposition.worker_index((row, col)) + 1
 
-        # Self floods
-        for flood_pack in flood_packs:
-            if flood_pack["to"] in self.field:
-                flood_coordinates[flood_pack["to"]].append(flood_pack)
+        return neighbour_ranks
 
-        # Resolve floods
-        for coord, floods in flood_coordinates.items():
-            if len(floods) == 0 or floods is None:
-                continue
+    def collect_moves(self, interior):
+        """Create the move packs of the air units moving to region 3, or to region 2.
 
-            if len(floods) == 1:
-                if floods[0]["to"] in self.field:
-                    new_water_unit = self._create_unit("W", floods[0]["to"], self.N)
-                    # new_water_unit.attack_power = floods[0]["attack_power"]
-                    self.field[floods[0]["to"]] = new_water_unit
+        The moves to region 3 only come from the grid, the halo holds the move directions of the neighbours.
+        """
+        if self.deciding_units:
+            cells = self.reach_cells
+        elif interior:
+            return np.empty(0, dtype=MOVE_PACK)
+        else:
+            # without air units deciding in the grid, only those of the neighbours in the first halo ring move
+            cells = self.halo_ring_cells
+
+        rows, cols = np.unravel_index(cells[self.move_direction.ravel()[cells] != NO_MOVE], self.faction.shape)
+        directions = self.move_direction[rows, cols]
+        to_rows, to_cols = rows + directions // 3 - 1, cols + directions % 3 - 1
+
+        # keep the moves to the region
+        to_region = self.region[to_rows, to_cols] == (3 if interior else 2)
+        rows, cols, to_rows, to_cols = rows[to_region], cols[to_region], to_rows[to_region], to_cols[to_region]
+
+        move_packs = np.empty(len(rows), dtype=MOVE_PACK)
+        move_packs["from"] = np.column_stack((rows, cols))
+        move_packs["to"] = np.column_stack((to_rows, to_cols))
+        move_packs["health"] = self.health[rows, cols]
+        move_packs["attack_power"] = self.attack_power[rows, cols]
+        move_packs["healing_rate"] = self.healing_rate[rows, cols]
+        return move_packs
+
+    def resolve_moves(self, move_packs):
+        """Resolve the moves of the air units into the grid."""
+        # the air units leave their cells in the grid, the packs keep their stats
+        grid_directions = self.move_direction[self.grid]
+        leaving = (grid_directions != NO_MOVE) & (grid_directions != STAY)
+        for array in self.field_arrays:
+            array[self.grid][leaving] = NEUTRAL
+        self.move_direction[:] = NO_MOVE
+
+        # the units moving to the same cell are combined, a single unit keeps its healing rate
+        to_cells, moves, move_counts = np.unique(np.ravel_multi_index(tuple(move_packs["to"].T), self.faction.shape),
+                                                 return_inverse=True, return_counts=True)
+        to_cells = np.unravel_index(to_cells, self.faction.shape)
+        health, attack_power = self.combine_air_units_while_moving(moves, move_packs, len(move_counts))
+        healing_rate = np.where(move_counts == 1, np.bincount(moves, move_packs["healing_rate"], len(move_counts)),
+                                AirUnit.base_healing_rate)
+        self._place_unit(to_cells, AIR, health, attack_power, healing_rate)
+
+    def combine_air_units_while_moving(self, moves, move_packs, cell_count):
+        """Sum the healths and attack powers of the air units moving to every cell, the healths up to the maximum.
+
+        The moves are the indices of the target cells of the packs.
+        """
+        health = np.minimum(AirUnit.max_health, np.bincount(moves, move_packs["health"], cell_count))
+        attack_power = np.bincount(moves, move_packs["attack_power"], cell_count)
+        return health.astype(np.int32), attack_power.astype(np.int32)
+
+    def get_r2_r3(self):
+        """Get the faction codes and healths of the cells in regions 2 and 3, stacked in one buffer."""
+        return np.stack((self.faction[self.grid], self.health[self.grid])).astype(np.int32)
+
+    def action_phase(self, interior):
+        """Create the attack packs on region 3 and the heal packs of its units, or those of the rest of the reach.
+
+        The attacks on region 3 and the heals of its units only read the grid. The attacks on the first ring
+        of the halo decide the inferno of the fire units in the grid.
+        """
+        # the cells near a change since the last action phase, the halo is up to date in the second call
+        active = dilate(self._changed_cells(), ACTION_REACH).ravel()
+        if not interior:
+            self.action_snapshot = [array.copy() for array in self.field_arrays]
+
+        victims = self.region_cells[3] if interior else self.border_reach_cells
+        attack_packs = self._map_bands(self.attacks_on, *self._units_in(victims[active[victims]]))
+
+        # if the units health is below 50 percent or it has no attackable enemies, heal
+        healers = self.region_cells[3 if interior else 2]
+        rows, cols = self._units_in(healers[active[healers]])
+        healing = ~np.concatenate(self._map_bands(self.is_attacking, rows, cols))
+        heal_packs = np.zeros(np.count_nonzero(healing), dtype=ACTION_PACK)
+        heal_packs["type"] = HEAL
+        heal_packs["from"] = heal_packs["to"] = np.column_stack((rows[healing], cols[healing]))
+
+        return np.concatenate(attack_packs + [heal_packs])
+
+    def _changed_cells(self):
+        """Get the mask of the cells changed since the field was before the last action phase, or by it."""
+        if self.action_snapshot is None:
+            return np.ones(self.faction.shape, dtype=bool)
+
+        changed = self.action_changed.copy()
+        for array, snapshot in zip(self.field_arrays, self.action_snapshot):
+            changed |= array != snapshot
+        return changed
+
+    def is_attacking(self, rows, cols):
+        """Check which units in the given field indices attack this round instead of healing."""
+        codes = self.faction[rows, cols]
+        attacking = np.zeros(len(rows), dtype=bool)
+        for direction, (i, j) in enumerate(AirUnit.attack_directions):
+            target_rows, target_cols = rows + i, cols + j
+
+            # if the unit is an air unit, check enlarged attack positions
+            enlarged = (codes == AIR) & (self.faction[target_rows, target_cols] == NEUTRAL)
+            target_rows = np.where(enlarged, rows + 2*i, target_rows)
+            target_cols = np.where(enlarged, cols + 2*j, target_cols)
+
+            # the attack positions out of bounds are skipped
+            targets = self.faction[target_rows, target_cols]
+            attacking |= (ATTACK_DIRECTIONS[codes, direction] & self.on_board[target_rows, target_cols] &
+                          (targets != NEUTRAL) & (targets != codes))
+
+        # units below 50 percent health heal instead of attacking
+        return attacking & (2 * self.health[rows, cols] >= MAX_HEALTH[codes])
+
+    def attacks_on(self, rows, cols):
+        """Create the attack packs of the units attacking the units in the given field indices."""
+        codes = self.faction[rows, cols]
+        attack_packs = [np.zeros(0, dtype=ACTION_PACK)]
+        for direction, (i, j) in enumerate(AirUnit.attack_directions):
+            attacker_rows, attacker_cols = rows - i, cols - j
+            adjacent = ATTACK_DIRECTIONS[self.faction[attacker_rows, attacker_cols], direction]
+
+            # an air unit attacks 2 cells away over a neutral cell
+            enlarged = self.faction[attacker_rows, attacker_cols] == NEUTRAL
+            attacker_rows = np.where(enlarged, rows - 2*i, attacker_rows)
+            attacker_cols = np.where(enlarged, cols - 2*j, attacker_cols)
+            attacker_codes = self.faction[attacker_rows, attacker_cols]
+            enlarged &= attacker_codes == AIR
+
+            # units below 50 percent health heal instead of attacking
+            attacking = ((adjacent | enlarged) & (attacker_codes != codes) &
+                         (2 * self.health[attacker_rows, attacker_cols] >= MAX_HEALTH[attacker_codes]))
+            attacker_rows, attacker_cols = attacker_rows[attacking], attacker_cols[attacking]
+
+            packs = np.zeros(len(attacker_rows), dtype=ACTION_PACK)
+            packs["type"] = ATTACK
+            packs["from"] = np.column_stack((attacker_rows, attacker_cols))
+            packs["to"] = np.column_stack((rows[attacking], cols[attacking]))
+            packs["attack_power"] = self.attack_power[attacker_rows, attacker_cols]
+            attack_packs.append(packs)
+
+        return np.concatenate(attack_packs)
+
+    def resolve_actions(self, action_packs):
+        """Resolve the actions on the grid and the first halo ring, which decides the inferno of the fire units."""
+        attack_packs = action_packs[action_packs["type"] == ATTACK]
+        heal_packs = action_packs[action_packs["type"] == HEAL]
+        faction, health, attack_power, healing_rate = (array.ravel() for array in self.field_arrays)
+
+        # every unit is attacked with the stats it had before the phase, the hits on a unit add up
+        targets = np.ravel_multi_index(tuple(attack_packs["to"].T), self.faction.shape)
+        total_hit = np.zeros(self.faction.size, dtype=np.int32)
+        np.add.at(total_hit, targets, attack_packs["attack_power"])
+        hit = np.unique(targets)
+
+        # earth units special ability
+        total_hit[hit] = np.where(faction[hit] == EARTH, total_hit[hit] // 2, total_hit[hit])
+        health[hit] -= total_hit[hit]
+        dead = hit[health[hit] <= 0]
+        self._clear_cell(np.unravel_index(dead, self.faction.shape))
+
+        # if the victim dies, the fire units that attacked it perform inferno, once for every dead victim
+        attackers = np.ravel_multi_index(tuple(attack_packs["from"].T), self.faction.shape)
+        fires = attackers[np.isin(targets, dead) & (faction[attackers] == FIRE)]
+        infernos = np.bincount(fires, minlength=self.faction.size)
+        fires = np.unique(fires)
+        attack_power[fires] = np.minimum(FireUnit.max_attack_power, attack_power[fires] + infernos[fires])
+
+        # heal action, if the unit is still alive
+        heals = np.ravel_multi_index(tuple(heal_packs["to"].T), self.faction.shape)
+        heals = heals[faction[heals] != NEUTRAL]
+        health[heals] = np.minimum(MAX_HEALTH[faction[heals]], health[heals] + healing_rate[heals])
+
+        self.action_changed = np.zeros(self.faction.shape, dtype=bool)
+        for array, snapshot in zip(self.field_arrays, self.action_snapshot):
+            self.action_changed |= array != snapshot
+
+    def flood_phase(self, interior):
+        """Create the flood packs of the water units in region 3, or of the rest that can flood the grid."""
+        rows, cols = self._units_in(self.region_cells[3] if interior else self.border_reach_cells, WATER)
+        return np.concatenate(self._map_bands(self.floods_of, rows, cols))
+
+    def floods_of(self, rows, cols):
+        """Create the flood packs of the water units in the given field indices."""
+        free = self.on_board & (self.faction == NEUTRAL)
+
+        # the lexicographically smallest neutral neighbour is the first one in row order
+        to_rows, to_cols = np.zeros(len(rows), dtype=np.intp), np.zeros(len(rows), dtype=np.intp)
+        found = np.zeros(len(rows), dtype=bool)
+        for direction in range(9):
+            i, j = direction // 3 - 1, direction % 3 - 1
+            first = ~found & free[rows + i, cols + j]
+            to_rows[first], to_cols[first] = rows[first] + i, cols[first] + j
+            found |= first
+
+        # the neighbour resolves the floods into its own grid
+        flooding = found & (self.region[to_rows, to_cols] != 1)
+        flood_packs = np.empty(np.count_nonzero(flooding), dtype=FLOOD_PACK)
+        flood_packs["from"] = np.column_stack((rows[flooding], cols[flooding]))
+        flood_packs["to"] = np.column_stack((to_rows[flooding], to_cols[flooding]))
+        flood_packs["attack_power"] = self.attack_power[rows[flooding], cols[flooding]]
+        return flood_packs
 
-            else:
-                if floods[0]["to"] in self.field:
-                    new_water_unit = self._create_unit("W", floods[0]["to"], self.N)
-                    # new_water_unit.attack_power = floods[0]["attack_power"]
-                    self.field[floods[0]["to"]] = new_water_unit
+    def resolve_floods(self, flood_packs):
+        """Resolve the floods of the units in the grid, every flooded cell gets a single new water unit."""
+        flooded = np.unique(np.ravel_multi_index(tuple(flood_packs["to"].T), self.faction.shape))
+        self._place_unit(np.unravel_index(flooded, self.faction.shape), WATER, MAX_HEALTH[WATER], ATTACK_POWER[WATER],
+                         HEALING_RATE[WATER])
 
     def reset_attack_powers(self):
         """Reset the attack powers of the fire units in the grid."""
-        for coord, unit in self.field.items():
-            if isinstance(unit, FireUnit):
-                unit.attack_power = 4
+        self.attack_power[self.faction == FIRE] = FireUnit.base_attack_power